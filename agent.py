@@ -0,0 +1,352 @@
+import math
+import time
+import queue
+import socket
+import struct
+import argparse
+import threading
+from get import CCYAN, CRED, CRESET, CGREEN, PingResult, PingHistory, probe_target, group_results, print_group_statistics
+
+# Every message on the wire is a 5 byte header (message type, payload length) followed by the payload.
+# Strings are UTF-8 with a 2 byte length prefix and all integers are network byte order.
+HEADER = struct.Struct("!BI")
+HELLO = 1  # Agent -> controller: agent name
+JOB = 2  # Controller -> agent: job id, protocol, port, count, delay, heartbeat interval, targets
+RESULT = 3  # Agent -> controller: job id, protocol, port, timestamp, response time, target, address, error
+DONE = 4  # Agent -> controller: job id
+BYE = 5  # Controller -> agent: no more work
+HEARTBEAT = 6  # Agent -> controller: job id, sent while a job runs so delays and slow probes don't look like a lost agent
+
+PROTOCOLS = ["TCP", "UDP", "ICMP", "HTTP"]
+JOB_HEADER = struct.Struct("!IBHIffI")  # Job id, protocol, port, count, delay, heartbeat interval, number of targets
+RESULT_HEADER = struct.Struct("!IBHdd")
+JOB_ID = struct.Struct("!I")
+
+def pack_string(value):
+    data = (value or "").encode()
+    return struct.pack("!H", len(data)) + data
+
+def unpack_string(payload, offset):
+    (length,) = struct.unpack_from("!H", payload, offset)
+    offset += 2
+    return payload[offset:offset + length].decode() or None, offset + length
+
+def send_message(sock, message_type, payload=b""):
+    sock.sendall(HEADER.pack(message_type, len(payload)) + payload)
+
+def recv_exact(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Connection closed")
+        data += chunk
+    return bytes(data)
+
+def recv_message(sock):
+    message_type, length = HEADER.unpack(recv_exact(sock, HEADER.size))
+    return message_type, recv_exact(sock, length)
+
+def encode_job(job_id, protocol, port, count, delay, targets, heartbeat=20.0):
+    payload = JOB_HEADER.pack(job_id, PROTOCOLS.index(protocol), port or 0, count, delay, heartbeat, len(targets))
+    return payload + b"".join(pack_string(target) for target in targets)
+
+def decode_job(payload):
+    job_id, protocol, port, count, delay, heartbeat, num_targets = JOB_HEADER.unpack_from(payload)
+    offset = JOB_HEADER.size
+    targets = []
+    for _ in range(num_targets):
+        target, offset = unpack_string(payload, offset)
+        targets.append(target)
+    return job_id, PROTOCOLS[protocol], port or None, count, delay, heartbeat, targets
+
+def encode_result(job_id, result):
+    response_time = result.response_time if result.response_time is not None else math.nan
+    payload = RESULT_HEADER.pack(job_id, PROTOCOLS.index(result.protocol), int(result.port or 0), result.timestamp, response_time)
+    return payload + pack_string(result.target) + pack_string(result.address) + pack_string(result.error)
+
+def decode_result(payload):
+    job_id, protocol, port, timestamp, response_time = RESULT_HEADER.unpack_from(payload)
+    target, offset = unpack_string(payload, RESULT_HEADER.size)
+    address, offset = unpack_string(payload, offset)
+    error, offset = unpack_string(payload, offset)
+    response_time = None if math.isnan(response_time) else response_time
+    result = PingResult(target, PROTOCOLS[protocol], port or None, response_time, error, address)
+    result.timestamp = timestamp
+    return job_id, result
+
+def run_agent(controller_host, controller_port, name=None):
+    # Agent mode: connect to the controller, then run every job it sends and stream the results back
+    sock = socket.create_connection((controller_host, controller_port))
+    lock = threading.Lock()  # Results and heartbeats are written from different threads
+
+    def send(message_type, payload=b""):
+        with lock:
+            send_message(sock, message_type, payload)
+
+    def heartbeat(job_id, interval, done):
+        while not done.wait(interval):
+            try:
+                send(HEARTBEAT, JOB_ID.pack(job_id))
+            except OSError:
+                return
+
+    try:
+        send(HELLO, pack_string(name or socket.gethostname()))
+        while True:
+            message_type, payload = recv_message(sock)
+            if message_type == BYE:
+                break
+            if message_type != JOB:
+                continue
+
+            job_id, protocol, port, count, delay, heartbeat_interval, targets = decode_job(payload)
+            done = threading.Event()
+            threading.Thread(target=heartbeat, args=(job_id, heartbeat_interval, done), daemon=True).start()
+            try:
+                for round_number in range(count):
+                    for target in targets:
+                        try:
+                            results = probe_target(target, protocol, port)
+                        except Exception as e:  # Resolution failures are results too, the controller should see them
+                            results = [PingResult(target, protocol, port, None, f"Error: {str(e)}")]
+                        for result in results:
+                            send(RESULT, encode_result(job_id, result))
+                    if round_number < count - 1:
+                        time.sleep(delay)  # Add a delay between each round
+            finally:
+                done.set()
+            send(DONE, JOB_ID.pack(job_id))
+    except ConnectionError:
+        pass  # The controller went away
+    finally:
+        sock.close()
+
+class AgentConnection:
+    def __init__(self, sock, name):
+        self.sock = sock
+        self.name = name
+        self.lock = threading.Lock()  # Serializes writes from the sweep thread
+
+    def send(self, message_type, payload=b""):
+        with self.lock:
+            send_message(self.sock, message_type, payload)
+
+class Controller:
+    def __init__(self, host="0.0.0.0", port=9000):
+        self.server = socket.create_server((host, port), family=socket.AF_INET6 if ":" in host else socket.AF_INET)
+        self.port = self.server.getsockname()[1]
+        self.agents = {}
+        self.messages = queue.Queue()  # (agent name, message type, payload) from every agent's reader thread
+        self.vantages = {}  # Agent name -> PingHistory of everything probed from that vantage point
+        self.next_job_id = 1
+        self.unprobed = {}  # Agent name -> targets the last sweep could not get probed
+        self.lock = threading.Lock()
+        threading.Thread(target=self.accept_agents, daemon=True).start()
+
+    def accept_agents(self):
+        while True:
+            try:
+                sock, _ = self.server.accept()
+            except OSError:
+                return  # The controller was closed
+            threading.Thread(target=self.read_agent, args=(sock,), daemon=True).start()
+
+    def read_agent(self, sock):
+        agent = None
+        try:
+            message_type, payload = recv_message(sock)
+            if message_type != HELLO:
+                sock.close()
+                return
+            name, _ = unpack_string(payload, 0)
+            with self.lock:
+                # Two agents on the same host still need to be told apart
+                while name in self.agents:
+                    name += "'"
+                agent = AgentConnection(sock, name)
+                self.agents[name] = agent
+                self.vantages.setdefault(name, PingHistory())
+            while True:
+                message_type, payload = recv_message(sock)
+                self.messages.put((name, message_type, payload))
+        except (ConnectionError, OSError, struct.error):
+            if agent:
+                with self.lock:
+                    self.agents.pop(agent.name, None)
+                self.messages.put((agent.name, None, None))  # Tell the sweep this agent's jobs will never finish
+            sock.close()
+
+    def wait_for_agents(self, count, timeout=None):
+        deadline = time.time() + timeout if timeout is not None else None
+        while len(self.agents) < count:
+            if deadline is not None and time.time() > deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def sweep(self, targets, protocol, port=None, count=1, delay=1.0, mode="split", idle_timeout=60, timeout=None):
+        # "split" spreads the targets across the agents to share the load, "all" has every
+        # agent probe every target so the vantage points can be compared. Agents send a heartbeat
+        # every idle_timeout / 3 seconds while they work. If an agent disconnects, or sends nothing
+        # (not even a heartbeat) for idle_timeout seconds, its unfinished targets go to the remaining agents
+        # in split mode; whatever can't be reassigned, or is still running after `timeout` seconds,
+        # ends up in self.unprobed (agent name -> targets) instead of silently missing.
+        with self.lock:
+            agents = list(self.agents.values())
+        if not agents:
+            raise RuntimeError("No agents connected")
+
+        self.unprobed = {}
+        pending = {}  # Job id -> (agent name, targets)
+        last_seen = {agent.name: time.time() for agent in agents}
+
+        def assign(agent_targets, to_agents):
+            for index, agent in enumerate(to_agents):
+                job_targets = agent_targets[index::len(to_agents)] if mode == "split" else list(agent_targets)
+                if not job_targets:
+                    continue
+                job_id = self.next_job_id
+                self.next_job_id += 1
+                pending[job_id] = (agent.name, job_targets)
+                last_seen[agent.name] = time.time()
+                try:
+                    agent.send(JOB, encode_job(job_id, protocol, port, count, delay, job_targets, idle_timeout / 3))
+                except OSError:
+                    pass  # Its reader thread reports the disconnect, which reassigns this job
+
+        def agent_lost(name):
+            self.drop_agent(name)
+            lost_jobs = [job_id for job_id, (agent_name, _) in pending.items() if agent_name == name]
+            lost_targets = [target for job_id in lost_jobs for target in pending.pop(job_id)[1]]
+            with self.lock:
+                remaining = [agent for agent in self.agents.values() if agent.name != name]
+            if mode == "split" and remaining and lost_targets:
+                assign(lost_targets, remaining)
+            elif lost_targets:
+                self.unprobed.setdefault(name, []).extend(lost_targets)
+
+        assign(list(targets), agents)
+        deadline = time.time() + timeout if timeout is not None else None
+
+        while pending:
+            now = time.time()
+            if deadline is not None and now >= deadline:
+                for name, job_targets in pending.values():
+                    self.unprobed.setdefault(name, []).extend(job_targets)
+                pending.clear()
+                break
+
+            # Agents with work that have gone quiet for too long are treated as gone
+            busy = {name for name, _ in pending.values()}
+            for name in busy:
+                if now - last_seen[name] >= idle_timeout:
+                    agent_lost(name)
+            if not pending:
+                break
+
+            wait = min(last_seen[name] for name, _ in pending.values()) + idle_timeout - now
+            if deadline is not None:
+                wait = min(wait, deadline - now)
+            try:
+                name, message_type, payload = self.messages.get(timeout=max(wait, 0.01))
+            except queue.Empty:
+                continue
+
+            last_seen[name] = time.time()  # Any message counts as a sign of life, heartbeats included
+            if message_type == RESULT:
+                job_id, result = decode_result(payload)
+                if job_id in pending:
+                    self.vantages[name].add_result(result, save=False)
+            elif message_type == DONE:
+                pending.pop(JOB_ID.unpack(payload)[0], None)
+            elif message_type is None:
+                agent_lost(name)
+
+        return self.vantages
+
+    def drop_agent(self, name):
+        with self.lock:
+            agent = self.agents.pop(name, None)
+        if agent:
+            try:
+                agent.sock.shutdown(socket.SHUT_RDWR)  # Unblocks its reader thread, which closes the socket
+            except OSError:
+                pass
+
+    def close(self):
+        with self.lock:
+            agents = list(self.agents.values())
+        for agent in agents:
+            try:
+                agent.send(BYE)
+            except OSError:
+                pass
+        self.server.close()
+
+def display_vantages(vantages, unprobed=None):
+    # Per vantage point totals, then every target as seen from each vantage point, so a target
+    # failing everywhere (service down) stands apart from one vantage point failing everything
+    print(f"{CGREEN}--- Per Vantage Point ---{CRESET}")
+    for name, history in vantages.items():
+        if history.results:
+            print_group_statistics(name, history.results)
+
+    targets = group_results([result for history in vantages.values() for result in history.results], lambda result: result.target)
+    for target in targets:
+        print(f"\n{CCYAN}{target}{CRESET}")
+        for name, history in vantages.items():
+            results = [result for result in history.results if result.target == target]
+            if results:
+                print_group_statistics(f"  {name}", results)
+
+    for name, targets in (unprobed or {}).items():
+        print(f"\n{CRED}Not probed (agent {name} was lost): {', '.join(targets)}{CRESET}")
+
+def parse_address(value):
+    host, _, port = value.rpartition(":")
+    return host.strip("[]") or "0.0.0.0", int(port)
+
+def main():
+    parser = argparse.ArgumentParser(description="PingIt! distributed probe agents and controller")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    agent_parser = subparsers.add_parser("agent", help="Run probes on behalf of a controller")
+    agent_parser.add_argument("controller", help="Controller address as HOST:PORT")
+    agent_parser.add_argument("--name", help="Vantage point name (defaults to the hostname)")
+
+    controller_parser = subparsers.add_parser("controller", help="Spread a sweep across agents and collect the results")
+    controller_parser.add_argument("targets", nargs="+", help="IP addresses, websites or (for HTTP) URLs")
+    controller_parser.add_argument("--listen", default="0.0.0.0:9000", help="Address to accept agents on as HOST:PORT")
+    controller_parser.add_argument("--agents", type=int, default=1, help="Number of agents to wait for before starting")
+    controller_parser.add_argument("--protocol", choices=PROTOCOLS, default="TCP")
+    controller_parser.add_argument("--port", type=int)
+    controller_parser.add_argument("--count", type=int, default=1, help="Number of pings per target")
+    controller_parser.add_argument("--delay", type=float, default=1.0, help="Delay between rounds in seconds")
+    controller_parser.add_argument("--mode", choices=["split", "all"], default="split", help="Split the targets across agents or have every agent probe every target")
+    controller_parser.add_argument("--idle-timeout", type=float, default=60, help="Seconds an agent with work may stay silent before its targets are reassigned")
+    controller_parser.add_argument("--timeout", type=float, help="Give up on unfinished targets after this many seconds")
+
+    args = parser.parse_args()
+
+    if args.command == "agent":
+        run_agent(*parse_address(args.controller), args.name)
+        return
+
+    if args.protocol in ("TCP", "UDP") and args.port is None:
+        parser.error(f"--port is required for {args.protocol}")
+
+    controller = Controller(*parse_address(args.listen))
+    try:
+        print(f"Waiting for {CGREEN}{args.agents}{CRESET} agent(s) on port {CGREEN}{controller.port}{CRESET}")
+        controller.wait_for_agents(args.agents)
+        print(f"Sweeping {CGREEN}{len(args.targets)}{CRESET} target(s) from {CGREEN}{', '.join(controller.agents)}{CRESET}\n")
+        vantages = controller.sweep(args.targets, args.protocol, args.port, args.count, args.delay, args.mode, args.idle_timeout, args.timeout)
+        display_vantages(vantages, controller.unprobed)
+    except KeyboardInterrupt:
+        print(f"\n{CRED}Sweep interrupted{CRESET}")
+    finally:
+        controller.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+import os
+import mmap
+import struct
+import argparse
+from datetime import datetime
+
+# Archive layout:
+#   magic, version
+#   blocks, each holding one target's series for a stretch of time
+#   block index (target, time range, offset, length, sample count per block)
+#   footer: index offset, number of index entries, magic
+#
+# Inside a block timestamps are whole milliseconds stored as a first value, a first delta and then
+# delta-of-deltas, so a steady 1 Hz series costs one byte per sample. Loss is a bitmap with one bit
+# per sample and only answered samples carry an RTT: whole microseconds, stored as the zigzag varint
+# of the difference from the previous RTT.
+MAGIC = b"PIAR"
+VERSION = 1
+HEADER = struct.Struct("!4sB")
+INDEX_ENTRY = struct.Struct("!QQQII")  # Start ms, end ms, offset, length, sample count (after the target string)
+FOOTER = struct.Struct("!QI4s")
+
+def zigzag(value):
+    return (value << 1) ^ (value >> 63)
+
+def unzigzag(value):
+    return (value >> 1) ^ -(value & 1)
+
+def write_varint(buffer, value):
+    while value > 0x7F:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+def read_varint(data, offset):
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+def pack_string(value):
+    data = value.encode()
+    return struct.pack("!H", len(data)) + data
+
+def unpack_string(data, offset):
+    (length,) = struct.unpack_from("!H", data, offset)
+    offset += 2
+    return bytes(data[offset:offset + length]).decode(), offset + length
+
+def encode_block(target, samples):
+    # samples is a time ordered list of (timestamp in seconds, RTT in ms or None for a lost probe)
+    buffer = bytearray(pack_string(target))
+    write_varint(buffer, len(samples))
+
+    previous_time = previous_delta = 0
+    for index, (timestamp, _) in enumerate(samples):
+        milliseconds = round(timestamp * 1000)
+        if index == 0:
+            write_varint(buffer, milliseconds)
+        else:
+            delta = milliseconds - previous_time
+            write_varint(buffer, zigzag(delta - previous_delta if index > 1 else delta))
+            previous_delta = delta
+        previous_time = milliseconds
+
+    bitmap = bytearray((len(samples) + 7) // 8)
+    for index, (_, rtt) in enumerate(samples):
+        if rtt is None:
+            bitmap[index >> 3] |= 1 << (index & 7)
+    buffer += bitmap
+
+    previous_rtt = 0
+    for _, rtt in samples:
+        if rtt is not None:
+            microseconds = round(rtt * 1000)
+            write_varint(buffer, zigzag(microseconds - previous_rtt))
+            previous_rtt = microseconds
+
+    return bytes(buffer)
+
+def decode_block(data):
+    # Yields (timestamp in seconds, RTT in ms or None) without building the whole series
+    target, offset = unpack_string(data, 0)
+    count, offset = read_varint(data, offset)
+
+    timestamps = []
+    previous_time = previous_delta = 0
+    for index in range(count):
+        value, offset = read_varint(data, offset)
+        if index == 0:
+            previous_time = value
+        else:
+            delta = unzigzag(value) + (previous_delta if index > 1 else 0)
+            previous_time += delta
+            previous_delta = delta
+        timestamps.append(previous_time)
+
+    bitmap = data[offset:offset + (count + 7) // 8]
+    offset += len(bitmap)
+
+    previous_rtt = 0
+    for index, milliseconds in enumerate(timestamps):
+        if bitmap[index >> 3] & (1 << (index & 7)):
+            yield milliseconds / 1000, None
+        else:
+            value, offset = read_varint(data, offset)
+            previous_rtt += unzigzag(value)
+            yield milliseconds / 1000, previous_rtt / 1000
+
+class BlockInfo:
+    def __init__(self, target, start, end, offset, length, count):
+        self.target = target
+        self.start = start  # Timestamp of the first sample in seconds
+        self.end = end  # Timestamp of the last sample in seconds
+        self.offset = offset
+        self.length = length
+        self.count = count
+
+def read_index(data, path):
+    # Check the header and footer and return (index offset, [BlockInfo, ...])
+    if len(data) < HEADER.size + FOOTER.size:
+        raise ValueError(f"{path} is not a PingIt! archive")
+    magic, version = HEADER.unpack_from(data, 0)
+    index_offset, index_count, footer_magic = FOOTER.unpack_from(data, len(data) - FOOTER.size)
+    if magic != MAGIC or footer_magic != MAGIC:
+        raise ValueError(f"{path} is not a PingIt! archive")
+    if version != VERSION:
+        raise ValueError(f"Unsupported archive version {version}")
+
+    index = []
+    offset = index_offset
+    for _ in range(index_count):
+        target, offset = unpack_string(data, offset)
+        start, end, block_offset, length, count = INDEX_ENTRY.unpack_from(data, offset)
+        offset += INDEX_ENTRY.size
+        index.append(BlockInfo(target, start / 1000, end / 1000, block_offset, length, count))
+    return index_offset, index
+
+class ArchiveWriter:
+    def __init__(self, path, block_size=3600, append=False):
+        self.block_size = block_size  # Samples per target before a block is written out
+        self.series = {}  # Target -> buffered samples
+        self.index = []
+        if append and os.path.exists(path):
+            # Keep the existing blocks and their index entries; new blocks overwrite the old index and footer
+            self.file = open(path, "r+b")
+            try:
+                index_offset, self.index = read_index(self.file.read(), path)
+            except (ValueError, struct.error):
+                self.file.close()
+                raise
+            self.file.truncate(index_offset)
+            self.file.seek(index_offset)
+        else:
+            self.file = open(path, "wb")
+            self.file.write(HEADER.pack(MAGIC, VERSION))
+
+    def add(self, target, timestamp, rtt):
+        samples = self.series.setdefault(target, [])
+        samples.append((timestamp, rtt))
+        if len(samples) >= self.block_size:
+            self.write_block(target)
+
+    def write_block(self, target):
+        samples = sorted(self.series.pop(target), key=lambda sample: sample[0])
+        data = encode_block(target, samples)
+        offset = self.file.tell()
+        self.file.write(data)
+        self.index.append(BlockInfo(target, samples[0][0], samples[-1][0], offset, len(data), len(samples)))
+
+    def close(self):
+        for target in list(self.series):
+            self.write_block(target)
+        index_offset = self.file.tell()
+        for block in self.index:
+            self.file.write(pack_string(block.target))
+            self.file.write(INDEX_ENTRY.pack(round(block.start * 1000), round(block.end * 1000), block.offset, block.length, block.count))
+        self.file.write(FOOTER.pack(index_offset, len(self.index), MAGIC))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class ArchiveReader:
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        # Only the index is parsed up front; blocks are decoded when a query reaches them
+        _, self.index = read_index(self.data, path)
+
+    def targets(self):
+        return sorted({block.target for block in self.index})
+
+    def blocks(self, target=None, start=None, end=None):
+        for block in self.index:
+            if target is not None and block.target != target:
+                continue
+            if (start is not None and block.end < start) or (end is not None and block.start > end):
+                continue
+            yield block
+
+    def series(self, target, start=None, end=None):
+        # Yields (timestamp, RTT in ms or None) for the target within [start, end], in block order
+        for block in sorted(self.blocks(target, start, end), key=lambda block: block.start):
+            for timestamp, rtt in decode_block(self.data[block.offset:block.offset + block.length]):
+                if (start is None or timestamp >= start) and (end is None or timestamp <= end):
+                    yield timestamp, rtt
+
+    def summarize(self, target, start=None, end=None):
+        total = lost = 0
+        rtt_sum = 0.0
+        rtt_min = rtt_max = None
+        for _, rtt in self.series(target, start, end):
+            total += 1
+            if rtt is None:
+                lost += 1
+                continue
+            rtt_sum += rtt
+            rtt_min = rtt if rtt_min is None else min(rtt_min, rtt)
+            rtt_max = rtt if rtt_max is None else max(rtt_max, rtt)
+        received = total - lost
+        return {
+            "total": total,
+            "lost": lost,
+            "loss": lost / total * 100 if total else 0,
+            "min": rtt_min,
+            "avg": rtt_sum / received if received else None,
+            "max": rtt_max,
+        }
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def parse_time(value):
+    return datetime.fromisoformat(value).timestamp() if value else None
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize a PingIt! RTT archive")
+    parser.add_argument("archive")
+    parser.add_argument("--target", help="Only summarize this target")
+    parser.add_argument("--start", help="ISO date/time to start from, e.g. 2024-05-01")
+    parser.add_argument("--end", help="ISO date/time to stop at")
+    args = parser.parse_args()
+
+    start, end = parse_time(args.start), parse_time(args.end)
+    with ArchiveReader(args.archive) as reader:
+        print(f"{os.path.getsize(args.archive)} bytes, {len(reader.index)} blocks")
+        for target in [args.target] if args.target else reader.targets():
+            summary = reader.summarize(target, start, end)
+            if not summary["total"]:
+                continue
+            times = " | ".join(f"{name} {summary[name]:.3f} ms" for name in ("min", "avg", "max") if summary[name] is not None)
+            print(f"{target}: {summary['total']} samples | {summary['loss']:.2f}% loss | {times}")
+
+if __name__ == "__main__":
+    main()
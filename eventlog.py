@@ -0,0 +1,181 @@
+import os
+import gzip
+import json
+import glob
+import time
+import queue
+import shutil
+import threading
+
+def default_classify(error):
+    if error is None:
+        return "ok"
+    return "error"
+
+def normalize_port(port):
+    # The menus hand ports over as typed, so the same port can arrive as "443" or 443
+    try:
+        return int(port)
+    except (TypeError, ValueError):
+        return None
+
+class EventLog:
+    # Structured probe event log: one JSON object per line. log() only puts the result on a bounded
+    # queue; a background thread batches, serializes, writes, rotates and compresses, so the probing
+    # thread never waits on the disk. When the queue backs up, the backpressure policy decides what
+    # is lost: "drop" drops events once the queue is full, "sample" keeps only every sample_every-th
+    # event once the queue is past its high-water mark. Both are counted and logged as overload events.
+    # Failed writes, rotations and compressions are counted too and never stop the writer; events in a
+    # batch that couldn't be written are reported in a write_error event once writing works again.
+    def __init__(self, path="pingit.events.jsonl", classify=None, queue_size=65536, batch_size=512, flush_interval=1.0,
+                 max_bytes=64 * 1024 * 1024, max_age=3600, backups=10, policy="drop", sample_every=10):
+        if policy not in ("drop", "sample"):
+            raise ValueError(f"Unknown backpressure policy {policy}")
+        self.path = path
+        self.classify = classify or default_classify
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.high_water = queue_size * 3 // 4
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval  # Longest time an event waits in memory before it's written
+        self.max_bytes = max_bytes  # Rotate once the file reaches this size
+        self.max_age = max_age  # Rotate once the file is this many seconds old
+        self.backups = backups  # Number of compressed rotated files to keep
+        self.policy = policy
+        self.sample_every = sample_every
+        self.offered = 0
+        self.dropped = 0
+        self.sampled_out = 0
+        self.reported_dropped = self.reported_sampled_out = 0
+        self.write_errors = 0
+        self.lost = 0  # Events in batches that failed to be written
+        self.reported_write_errors = self.reported_lost = 0
+        self.prune_lock = threading.Lock()  # Compressors finishing together must not prune the same backups
+        self.file = None
+        self.opened_at = 0
+        self.compressors = []
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="event-log", daemon=True)
+        self.thread.start()
+
+    def log(self, result):
+        # Called on the probing thread: no formatting and no I/O here
+        self.offered += 1
+        if self.policy == "sample" and self.queue.qsize() >= self.high_water and self.offered % self.sample_every:
+            self.sampled_out += 1
+            return
+        try:
+            self.queue.put_nowait(result)
+        except queue.Full:
+            self.dropped += 1
+
+    def record(self, result):
+        return {
+            "ts": result.timestamp,
+            "target": result.target,
+            "protocol": result.protocol,
+            "port": normalize_port(result.port),
+            "address": getattr(result, "address", None),
+            "family": getattr(result, "family", None),
+            "rtt_ms": result.response_time,
+            "error": result.error,
+            "error_class": self.classify(result.error),
+        }
+
+    def run(self):
+        while not (self.stopping.is_set() and self.queue.empty()):
+            batch = []
+            try:
+                batch.append(self.queue.get(timeout=self.flush_interval))
+                while len(batch) < self.batch_size:
+                    batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            dropped, sampled_out, write_errors, lost = self.dropped, self.sampled_out, self.write_errors, self.lost
+            try:
+                lines = [json.dumps(self.record(result)) for result in batch]
+                # Make losses visible in the log itself
+                if dropped != self.reported_dropped or sampled_out != self.reported_sampled_out:
+                    lines.append(json.dumps({
+                        "ts": time.time(),
+                        "event": "overload",
+                        "dropped": dropped - self.reported_dropped,
+                        "sampled_out": sampled_out - self.reported_sampled_out,
+                    }))
+                if write_errors != self.reported_write_errors:
+                    lines.append(json.dumps({
+                        "ts": time.time(),
+                        "event": "write_error",
+                        "errors": write_errors - self.reported_write_errors,
+                        "lost": lost - self.reported_lost,
+                    }))
+                if lines:
+                    self.write("\n".join(lines) + "\n")
+            except Exception:
+                # Disk full, permissions, a record that won't serialize: lose this batch, not the writer
+                self.write_errors += 1
+                self.lost += len(batch)
+                continue
+            self.reported_dropped, self.reported_sampled_out = dropped, sampled_out
+            self.reported_write_errors, self.reported_lost = write_errors, lost
+
+    def write(self, data):
+        if self.file is None:
+            self.file = open(self.path, "a")
+            self.opened_at = time.time()
+        try:
+            self.file.write(data)
+            self.file.flush()
+        except OSError:
+            # Reopen on the next batch rather than keep writing to a file in an unknown state
+            try:
+                self.file.close()
+            except OSError:
+                pass
+            self.file = None
+            raise
+        if self.file.tell() >= self.max_bytes or time.time() - self.opened_at >= self.max_age:
+            try:
+                self.rotate()
+            except OSError:
+                self.write_errors += 1  # The data is written; the next batch appends to the unrotated file
+
+    def rotate(self):
+        self.file.close()
+        self.file = None
+        rotated = f"{self.path}.{time.strftime('%Y%m%d-%H%M%S')}"
+        suffix = 1
+        while os.path.exists(rotated) or os.path.exists(rotated + ".gz"):
+            rotated = f"{self.path}.{time.strftime('%Y%m%d-%H%M%S')}-{suffix}"
+            suffix += 1
+        os.replace(self.path, rotated)
+        # Compress off the writer thread so a large file doesn't hold up the queue
+        compressor = threading.Thread(target=self.compress, args=(rotated,), daemon=True)
+        compressor.start()
+        self.compressors = [thread for thread in self.compressors if thread.is_alive()] + [compressor]
+
+    def compress(self, path):
+        try:
+            with open(path, "rb") as source, gzip.open(path + ".gz", "wb") as target:
+                shutil.copyfileobj(source, target)
+            os.remove(path)
+        except OSError:
+            self.write_errors += 1  # The rotated file stays uncompressed rather than being lost
+            return
+        with self.prune_lock:
+            try:
+                rotated = sorted(glob.glob(glob.escape(self.path) + ".*.gz"), key=os.path.getmtime)
+                for old in rotated[:max(len(rotated) - self.backups, 0)]:
+                    os.remove(old)
+            except OSError:
+                self.write_errors += 1
+
+    def close(self):
+        # Write everything still queued, then stop the writer
+        self.stopping.set()
+        self.thread.join()
+        if self.file:
+            self.file.close()
+            self.file = None
+        for compressor in self.compressors:
+            compressor.join()
@@ -1,10 +1,27 @@
 import os
+import errno
 import time
 import socket
 import struct
 import subprocess
-import urllib.request
+import urllib.parse
+import http.client
+import ssl
+import selectors
+import threading
+import collections
+import heapq
+import array
+import json
+import math
+import re
+import queue
 import logging
+import logging.handlers
+import atexit
+from concurrent.futures import ThreadPoolExecutor
+from archive import ArchiveWriter
+from eventlog import EventLog
 from colorama import Fore, Style
 from simple_term_menu import TerminalMenu
 
@@ -18,47 +35,91 @@ CGREEN = Fore.LIGHTGREEN_EX
 welcome_message = f"{CCYAN}PingIt!{CWHITE} | {CRED}Conducting cross-platform ping+port testing through ping-like emulation for port verification{CRESET}\n{CRED}Version 1.0 | By {CGREEN}PoppingXanax{CRESET}"
 info = f"{CWHITE}\n! Report any issues on Github !{CRESET}\n"
 
-logging.basicConfig(filename='pingit.log', level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Log records are handed to a queue and written to pingit.log by a listener thread, off the probing threads
+log_handler = logging.FileHandler('pingit.log', delay=True)
+log_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+log_queue = logging.handlers.QueueHandler(queue.Queue(-1))
+log_queue.setFormatter(logging.Formatter('%(message)s'))  # The file handler adds the timestamp and level
+logging.basicConfig(level=logging.INFO, handlers=[log_queue])
+log_listener = logging.handlers.QueueListener(log_queue.queue, log_handler)
+log_listener.start()
+atexit.register(log_listener.stop)
 
 class PingResult:
-    def __init__(self, target, protocol, port, response_time, error):
+    def __init__(self, target, protocol, port, response_time, error, address=None, tcp_info=None):
         self.target = target
         self.protocol = protocol
         self.port = port
         self.response_time = response_time
         self.error = error
+        self.address = address  # The resolved address that was actually probed
+        self.family = family_name(address) if address else None
+        self.tcp_info = tcp_info or []  # Kernel TCP_INFO samples taken on the probe's connection
+        self.test_number = None  # Set once the result is saved to its test_N.txt file
+        self.timestamp = time.time()  # When the probe finished
 
 class PingHistory:
-    def __init__(self):
+    def __init__(self, event_log=None):
         self.results = []
-        self.test_number = 1
-
-    def add_result(self, result):
+        self.event_log = event_log  # Every result is also written to the structured event log, saved or not
+        self.journal_units = set()  # (sweep id, round, target index) of sweep units whose results are in this history
+        self.archived = {}  # Archive path -> number of results already exported to it this session
+        # Continue numbering after the files a previous run left behind instead of overwriting them
+        existing = [int(match.group(1)) for match in (re.fullmatch(r"test_(\d+)\.txt", name) for name in os.listdir(".")) if match]
+        self.test_number = max(existing, default=0) + 1
+
+    def add_result(self, result, save=True, log=True):
         self.results.append(result)
-        self.save_result(result)
+        if self.event_log and log:  # Results replayed from a sweep journal were logged when they were first probed
+            self.event_log.log(result)
+        if save:  # High-rate runs keep results in memory only instead of writing a file per probe
+            self.save_result(result)
 
     def save_result(self, result):
+        result.test_number = self.test_number
         filename = f"test_{self.test_number}.txt"
         with open(filename, "w") as file:
             file.write(f"--- Ping Result Test #{self.test_number} ---\n")
             file.write(f"Target: {result.target}\n")
             file.write(f"Protocol: {result.protocol}\n")
             file.write(f"Port: {result.port}\n")
-            file.write(f"Response Time: {result.response_time:.0f} ms\n")
+            if result.address:
+                file.write(f"Address: {result.address} ({result.family})\n")
+            file.write(f"Response Time: {format_response_time(result.response_time)}\n")
+            for tcp_info in result.tcp_info:
+                file.write(f"Kernel RTT: {tcp_info}\n")
             if result.error:
                 file.write(f"Error: {result.error}\n")
         self.test_number += 1
 
+    def export_archive(self, path):
+        # Append the results not yet exported to the path to a compact RTT archive, one series per
+        # target, protocol, port and address. An existing archive keeps its earlier blocks.
+        results = self.results[self.archived.get(os.path.abspath(path), 0):]
+        with ArchiveWriter(path, append=True) as writer:
+            for result in results:
+                series = f"{result.target} {result.protocol}" + (f"/{result.port}" if result.port else "") + (f" [{result.address}]" if result.address else "")
+                writer.add(series, result.timestamp, result.response_time)
+        self.archived[os.path.abspath(path)] = len(self.results)
+        return len(results)
+
     def display_history(self):
         if not self.results:
             print(f"{CRED}No ping history available.{CRESET}")
         else:
-            for result in self.results:
-                print(f"--- Ping Result Test #{result.test_number} ---")
+            for index, result in enumerate(self.results, start=1):
+                if result.test_number:
+                    print(f"--- Ping Result Test #{result.test_number} ---")
+                else:
+                    print(f"--- Ping Result {index} ---")
                 print(f"Target: {CCYAN}{result.target}")
                 print(f"Protocol: {CCYAN}{result.protocol}")
                 print(f"Port: {CCYAN}{result.port}")
-                print(f"Response Time: {CCYAN}{result.response_time:.0f} ms{CRESET}")
+                if result.address:
+                    print(f"Address: {CCYAN}{result.address} ({result.family})")
+                print(f"Response Time: {CCYAN}{format_response_time(result.response_time)}{CRESET}")
+                for tcp_info in result.tcp_info:
+                    print(f"Kernel RTT: {CCYAN}{tcp_info}{CRESET}")
                 if result.error:
                     print(f"Error: {CRED}{result.error}{CRESET}")
                 print()
@@ -78,17 +139,85 @@ class PingHistory:
             print(f"{CWHITE}Success Rate: {CGREEN}{success_rate:.2f}%")
             print(f"{CWHITE}Average Response Time: {CGREEN}{average_response_time:.2f} ms{CRESET}")
 
-def udp_ping(ip, port):
+            kernel_rtts = [tcp_info.rtt for result in self.results for tcp_info in result.tcp_info]
+            if kernel_rtts:
+                print(f"{CWHITE}Average Kernel RTT: {CGREEN}{sum(kernel_rtts) / len(kernel_rtts):.2f} ms {CWHITE}over {CGREEN}{len(kernel_rtts)} {CWHITE}samples{CRESET}")
+
+            # Failures caused by this machine running out of ports or file descriptors say nothing about the target
+            local_failures = len([result for result in self.results if is_local_error(result.error)])
+            remote_failures = total_pings - successful_pings - local_failures
+            if local_failures:
+                print(f"{CWHITE}Remote Failures: {CGREEN}{remote_failures}")
+                print(f"{CWHITE}Local Resource Failures: {CRED}{local_failures}{CRESET}")
+
+            # Break the results down per address family and per probed address
+            families = group_results(self.results, lambda result: result.family)
+            if families:
+                print(f"\n{CGREEN}--- Per Address Family ---{CRESET}")
+                for family, results in families.items():
+                    print_group_statistics(family, results)
+
+                print(f"\n{CGREEN}--- Per Address ---{CRESET}")
+                for address, results in group_results(self.results, lambda result: result.address).items():
+                    print_group_statistics(address, results)
+
+def format_response_time(response_time):
+    # Failed probes have no response time
+    return f"{response_time:.0f} ms" if response_time is not None else "N/A"
+
+def group_results(results, key):
+    # Group results by key, skipping results the key has no value for
+    groups = {}
+    for result in results:
+        value = key(result)
+        if value is not None:
+            groups.setdefault(value, []).append(result)
+    return groups
+
+def print_group_statistics(label, results):
+    response_times = [result.response_time for result in results if result.response_time is not None]
+    success_rate = len(response_times) / len(results) * 100
+    average_response_time = sum(response_times) / len(response_times) if response_times else 0
+    print(f"{CWHITE}{label}: {CGREEN}{len(response_times)}/{len(results)} {CWHITE}successful ({CGREEN}{success_rate:.2f}%{CWHITE}) | Average {CGREEN}{average_response_time:.2f} ms{CRESET}")
+
+def family_name(address):
+    return "IPv6" if ":" in address else "IPv4"
+
+def address_family(address):
+    return socket.AF_INET6 if ":" in address else socket.AF_INET
+
+def resolve_addresses(target, port=None, socktype=socket.SOCK_STREAM):
+    # Resolve every A and AAAA record for the target (IP literals resolve to themselves)
+    addresses = []
+    for family, _, _, _, sockaddr in socket.getaddrinfo(target, port, socket.AF_UNSPEC, socktype):
+        if family in (socket.AF_INET, socket.AF_INET6) and sockaddr[0] not in addresses:
+            addresses.append(sockaddr[0])
+
+    # Interleave the families, IPv6 first, the same way Happy Eyeballs orders its attempts
+    ipv6 = [address for address in addresses if family_name(address) == "IPv6"]
+    ipv4 = [address for address in addresses if family_name(address) == "IPv4"]
+    interleaved = []
+    for i in range(max(len(ipv6), len(ipv4))):
+        interleaved.extend(ipv6[i:i + 1] + ipv4[i:i + 1])
+    return interleaved
+
+def probe_addresses(ping_method, addresses, *args):
+    # Run the probe method against every address at once and return (address, response_time, error) tuples
+    with ThreadPoolExecutor(max_workers=len(addresses)) as executor:
+        futures = [executor.submit(ping_method, address, *args) for address in addresses]
+        return [(address,) + future.result() for address, future in zip(addresses, futures)]
+
+def udp_ping(ip, port, timeout=5):
     # UDP ping logic
     try:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        sock.settimeout(5)  # Set the timeout to 5 seconds
+        sock = socket.socket(address_family(ip), socket.SOCK_DGRAM)
+        sock.settimeout(timeout)  # Set the timeout (5 seconds by default)
 
         start_time = time.time()  # Record the start time
         sock.sendto(b"", (ip, port))  # Send an empty UDP packet to the target
 
         # Set a timeout for receiving the response
-        sock.settimeout(5)
+        sock.settimeout(timeout)
         try:
             data, addr = sock.recvfrom(1024)  # Receive the response
             end_time = time.time()  # Record the end time
@@ -104,18 +233,52 @@ def udp_ping(ip, port):
     except Exception as e:
         return None, f"Error: {str(e)}"
 
-def tcp_ping(ip, port):
+LOCAL_ERROR_PREFIX = "Local resource exhaustion"
+
+# Errors raised when this machine, not the target, runs out of ports, sockets or buffers
+LOCAL_ERRNOS = {errno.EADDRNOTAVAIL, errno.EADDRINUSE, errno.EMFILE, errno.ENFILE, errno.ENOBUFS, errno.ENOMEM}
+
+# Errors a non-blocking send raises when the local send buffer is full
+SEND_BUFFER_ERRNOS = {errno.EAGAIN, errno.EWOULDBLOCK, errno.ENOBUFS}
+
+def is_local_error(error):
+    return error is not None and error.startswith(LOCAL_ERROR_PREFIX)
+
+def error_class(error):
+    # Coarse, machine-readable class of a probe error for the event log
+    if error is None:
+        return "ok"
+    if is_local_error(error):
+        return "local"
+    lowered = error.lower()
+    for keyword, name in (("timeout", "timeout"), ("timed out", "timeout"), ("refused", "refused"), ("permission", "permission"),
+                          ("http error", "http"), ("packet lost", "lost"), ("name or service", "resolve"), ("getaddrinfo", "resolve")):
+        if keyword in lowered:
+            return name
+    return "error"
+
+def tcp_ping(ip, port, linger_reset=False, port_allocator=None):
     # TCP ping logic
+    sock = None
+    source_port = None
     try:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock = socket.socket(address_family(ip), socket.SOCK_STREAM)
         sock.settimeout(5)  # Set the timeout to 5 seconds
 
+        if linger_reset:
+            # Close with a RST instead of a FIN so the connection skips TIME_WAIT and frees the local port immediately
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+
+        if port_allocator:
+            source_port = port_allocator.acquire()
+            if source_port is None:
+                return None, f"{LOCAL_ERROR_PREFIX}: no free source port in {port_allocator.low}-{port_allocator.high}"
+            sock.bind(("::" if ":" in ip else "0.0.0.0", source_port))
+
         start_time = time.time()  # Record the start time
         sock.connect((ip, port))  # Connect to the target
         end_time = time.time()  # Record the end time
 
-        sock.close()
-
         ms_response = (end_time - start_time) * 1000  # Calculate the time difference in milliseconds
         return ms_response, None  # Return the response time and no error
 
@@ -123,44 +286,369 @@ def tcp_ping(ip, port):
         return None, "Connection timeout"
     except ConnectionRefusedError:
         return None, "Connection refused"
+    except OSError as e:
+        if e.errno in LOCAL_ERRNOS:
+            return None, f"{LOCAL_ERROR_PREFIX}: {e.strerror}"
+        return None, f"Error: {str(e)}"
     except Exception as e:
         return None, f"Error: {str(e)}"
+    finally:
+        if sock:
+            sock.close()
+        if source_port is not None:
+            port_allocator.release(source_port, linger_reset)
+
+class SourcePortAllocator:
+    # Hands out local ports from a fixed range, keeping ports that were closed normally out of
+    # rotation until their TIME_WAIT has expired so a bind never lands on a port still in use
+    def __init__(self, low, high, time_wait=60):
+        if not 0 < low <= high <= 65535:
+            raise ValueError(f"Invalid source port range {low}-{high}")
+        self.low = low
+        self.high = high
+        self.time_wait = time_wait
+        self.free = collections.deque((port, 0) for port in range(low, high + 1))  # (port, usable from) in release order
+        self.in_use = 0
+        self.exhausted = 0  # Number of times a probe found no usable port
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            # Ports are released in time order, so only the oldest one can have cooled down
+            if self.free and self.free[0][1] <= time.monotonic():
+                self.in_use += 1
+                return self.free.popleft()[0]
+            self.exhausted += 1
+            return None
+
+    def release(self, port, reset=False):
+        with self.lock:
+            self.in_use -= 1
+            self.free.append((port, time.monotonic() + (0 if reset else self.time_wait)))
+
+    def pressure(self):
+        # Fraction of the range that is either in use or cooling down in TIME_WAIT
+        with self.lock:
+            now = time.monotonic()
+            cooling = sum(1 for _, usable_from in self.free if usable_from > now)
+            return (self.in_use + cooling) / (self.high - self.low + 1)
+
+def local_port_pressure():
+    # Fraction of the OS ephemeral port range tied up by TCP sockets, or None where /proc isn't available
+    try:
+        with open("/proc/sys/net/ipv4/ip_local_port_range") as file:
+            low, high = (int(value) for value in file.read().split())
+        ports = set()
+        for table in ("/proc/net/tcp", "/proc/net/tcp6"):
+            if os.path.exists(table):
+                with open(table) as file:
+                    next(file)  # Skip the header line
+                    for line in file:
+                        local_port = int(line.split()[1].rsplit(":", 1)[1], 16)
+                        if low <= local_port <= high:
+                            ports.add(local_port)
+        return len(ports) / (high - low + 1)
+    except (OSError, ValueError):
+        return None
+
+def connect_error(error):
+    # Error message for the errno a non-blocking connect failed with
+    if error == errno.ECONNREFUSED:
+        return "Connection refused"
+    if error in LOCAL_ERRNOS:
+        return f"{LOCAL_ERROR_PREFIX}: {os.strerror(error)}"
+    return f"Error: {os.strerror(error)}"
+
+def tcp_flood(addresses, port, count, rate, linger_reset=False, port_allocator=None, timeout=5):
+    # High-rate TCP connect mode: pace `count` connects at `rate` per second, spread round-robin over the addresses.
+    # Returns (address, response time, error, start time) for every connect, in the order they were started.
+    # Every connect is non-blocking on one selector, so slow or silent targets don't hold back the rate.
+    results = [None] * count
+    selector = selectors.DefaultSelector()
+    pending = {}  # Index -> (socket, source port, start time) of connects still in their handshake
+    deadlines = collections.deque()  # (deadline, index) in start order, which is also deadline order
+
+    def finish(index, sock, source_port, sent_time, response_time, error):
+        results[index] = (addresses[index % len(addresses)], response_time, error, sent_time)
+        if sock:
+            sock.close()
+        if source_port is not None:
+            port_allocator.release(source_port, linger_reset)
+
+    def start(index):
+        address = addresses[index % len(addresses)]
+        sock = source_port = None
+        sent_time = time.time()
+        try:
+            sock = socket.socket(address_family(address), socket.SOCK_STREAM)
+            sock.setblocking(False)
+            if linger_reset:
+                # Close with a RST instead of a FIN so the connection skips TIME_WAIT and frees the local port immediately
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+            if port_allocator:
+                source_port = port_allocator.acquire()
+                if source_port is None:
+                    finish(index, sock, None, sent_time, None, f"{LOCAL_ERROR_PREFIX}: no free source port in {port_allocator.low}-{port_allocator.high}")
+                    return
+                sock.bind(("::" if ":" in address else "0.0.0.0", source_port))
+            sent_time = time.time()
+            error = sock.connect_ex((address, port))  # Start the handshake without waiting for it
+        except OSError as e:
+            finish(index, sock, source_port, sent_time, None, f"{LOCAL_ERROR_PREFIX}: {e.strerror}" if e.errno in LOCAL_ERRNOS else f"Error: {str(e)}")
+            return
+
+        if error == errno.EINPROGRESS:
+            selector.register(sock, selectors.EVENT_WRITE, index)
+            pending[index] = (sock, source_port, sent_time)
+            deadlines.append((time.monotonic() + timeout, index))
+        elif error == 0:
+            finish(index, sock, source_port, sent_time, (time.time() - sent_time) * 1000, None)
+        else:
+            finish(index, sock, source_port, sent_time, None, connect_error(error))
+
+    try:
+        start_time = time.monotonic()
+        started = 0
+        while started < count or pending:
+            now = time.monotonic()
+            # Anything past its deadline never finished its handshake
+            while deadlines and deadlines[0][0] <= now:
+                _, index = deadlines.popleft()
+                if index in pending:
+                    sock, source_port, sent_time = pending.pop(index)
+                    selector.unregister(sock)
+                    finish(index, sock, source_port, sent_time, None, "Connection timeout")
+
+            # Schedule against the start time so a slow loop catches up instead of drifting the rate
+            while started < count and start_time + started / rate <= now:
+                start(started)
+                started += 1
+
+            wakeups = [deadlines[0][0]] if deadlines else []
+            if started < count:
+                wakeups.append(start_time + started / rate)
+            if not wakeups:
+                continue
+            wait = max(min(wakeups) - time.monotonic(), 0)
+            if not pending:
+                time.sleep(wait)  # select() with nothing registered isn't portable
+                continue
+            for key, _ in selector.select(wait):
+                end_time = time.time()
+                sock, source_port, sent_time = pending.pop(key.data)
+                selector.unregister(sock)
+                error = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                if error == 0:
+                    finish(key.data, sock, source_port, sent_time, (end_time - sent_time) * 1000, None)
+                else:
+                    finish(key.data, sock, source_port, sent_time, None, connect_error(error))
+    finally:
+        for sock, source_port, _ in pending.values():
+            sock.close()
+            if source_port is not None:
+                port_allocator.release(source_port, linger_reset)
+        selector.close()
+
+    return results
+
+def tcp_connect_all(endpoints, read_info=False):
+    # Start a non-blocking connect to every (address, port, timeout) endpoint at once on one selector and
+    # return (response_time, error, tcp_info) for each, in order. Endpoints may repeat; each gets its own socket.
+    results = [None] * len(endpoints)
+    selector = selectors.DefaultSelector()
+    deadlines = []  # Heap of (deadline, index) so the next timeout is found without scanning every socket
+    start_times = {}
+
+    def finish(index, sock, start_time, error):
+        if error == 0:
+            ms_response = (time.time() - start_time) * 1000  # Calculate the time difference in milliseconds
+            results[index] = (ms_response, None, read_tcp_info(sock) if read_info else None)
+        else:
+            results[index] = (None, connect_error(error), None)
+        sock.close()
+
+    try:
+        for index, (address, port, timeout) in enumerate(endpoints):
+            try:
+                sock = socket.socket(address_family(address), socket.SOCK_STREAM)
+            except OSError as e:
+                results[index] = (None, f"{LOCAL_ERROR_PREFIX}: {e.strerror}" if e.errno in LOCAL_ERRNOS else f"Error: {str(e)}", None)
+                continue
+            try:
+                sock.setblocking(False)
+                start_time = time.time()  # Record the start time
+                error = sock.connect_ex((address, port))  # Start the handshake without waiting for it
+            except Exception as e:
+                results[index] = (None, f"Error: {str(e)}", None)
+                sock.close()
+                continue
+
+            if error == errno.EINPROGRESS:
+                selector.register(sock, selectors.EVENT_WRITE, index)
+                start_times[index] = (sock, start_time)
+                heapq.heappush(deadlines, (start_time + timeout, index))
+            else:
+                # The connect finished (or failed) straight away, so there is nothing to wait for
+                finish(index, sock, start_time, error)
+
+        while start_times:
+            now = time.time()
+            # Anything past its deadline never finished its handshake
+            while deadlines and deadlines[0][0] <= now:
+                _, index = heapq.heappop(deadlines)
+                if index in start_times:
+                    sock, _ = start_times.pop(index)
+                    selector.unregister(sock)
+                    sock.close()
+                    results[index] = (None, "Connection timeout", None)
+            if not start_times:
+                break
+
+            for key, _ in selector.select(deadlines[0][0] - now):
+                sock, start_time = start_times.pop(key.data)
+                selector.unregister(sock)
+                finish(key.data, sock, start_time, sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR))
+    finally:
+        for sock, _ in start_times.values():
+            sock.close()
+        selector.close()
+
+    return results
+
+def tcp_race(addresses, port, timeout=5, read_info=False):
+    # Happy-Eyeballs-style racing: start a non-blocking connect to every address at once and
+    # record when each handshake completes, instead of stopping at the first one that answers
+    results = tcp_connect_all([(address, port, timeout) for address in addresses], read_info)
+    return [(address,) + result for address, result in zip(addresses, results)]
+
+def race_winner(race_results):
+    # The address that completed its handshake first, if any did
+    connected = [(response_time, address) for address, response_time, _, _ in race_results if response_time is not None]
+    return min(connected)[1] if connected else None
+
+# struct tcp_info from linux/tcp.h up to tcpi_total_retrans: 8 one-byte fields followed by 24 u32 fields
+TCP_INFO_FORMAT = "8B24I"
+
+class TcpInfo:
+    def __init__(self, rtt, rttvar, retransmits, total_retrans, unacked):
+        self.rtt = rtt  # Kernel smoothed RTT in milliseconds
+        self.rttvar = rttvar  # Kernel RTT variance in milliseconds
+        self.retransmits = retransmits  # Retransmits of the currently outstanding segment
+        self.total_retrans = total_retrans  # Retransmits over the life of the connection
+        self.unacked = unacked
+
+    def __str__(self):
+        return f"{self.rtt:.3f} ms ± {self.rttvar:.3f} ms | Retransmits {self.total_retrans}"
+
+def read_tcp_info(sock):
+    # Read the kernel's own RTT measurement for the connection, or None where TCP_INFO isn't supported
+    if not hasattr(socket, "TCP_INFO"):
+        return None
+    try:
+        data = sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_INFO, struct.calcsize(TCP_INFO_FORMAT))
+        fields = struct.unpack(TCP_INFO_FORMAT, data.ljust(struct.calcsize(TCP_INFO_FORMAT), b"\x00"))
+    except OSError:
+        return None
+    # fields[2] is tcpi_retransmits, fields[12] tcpi_unacked, fields[23]/[24] tcpi_rtt/tcpi_rttvar (in microseconds), fields[31] tcpi_total_retrans
+    return TcpInfo(fields[23] / 1000, fields[24] / 1000, fields[2], fields[31], fields[12])
+
+def tcp_hold(ip, port, samples=1, interval=1):
+    # Connect once and hold the connection open, reading TCP_INFO after the handshake and then
+    # `samples - 1` more times. Each later sample sends a bare CRLF (which HTTP and most line based
+    # servers ignore) so the kernel gets a fresh RTT measurement from the ACK.
+    sock = None
+    tcp_infos = []
+    try:
+        sock = socket.socket(address_family(ip), socket.SOCK_STREAM)
+        sock.settimeout(5)  # Set the timeout to 5 seconds
 
-def icmp_ping(ip):
+        start_time = time.time()  # Record the start time
+        sock.connect((ip, port))  # Connect to the target
+        end_time = time.time()  # Record the end time
+        ms_response = (end_time - start_time) * 1000  # Calculate the time difference in milliseconds
+
+        # Without TCP_INFO (or if the connection goes away while held) the user-space time still stands
+        tcp_info = read_tcp_info(sock)
+        if tcp_info is None:
+            return ms_response, None, tcp_infos
+        tcp_infos.append(tcp_info)
+
+        try:
+            for _ in range(samples - 1):
+                time.sleep(interval)
+                sock.sendall(b"\r\n")
+                # Wait for the ACK so the sample includes the new measurement
+                deadline = time.time() + 5
+                tcp_info = read_tcp_info(sock)
+                while tcp_info and tcp_info.unacked and time.time() < deadline:
+                    time.sleep(0.001)
+                    tcp_info = read_tcp_info(sock)
+                if tcp_info is None:
+                    break
+                tcp_infos.append(tcp_info)
+        except OSError:
+            pass  # The peer closed the held connection; keep the samples taken so far
+
+        return ms_response, None, tcp_infos  # Return the response time, no error and the kernel samples
+
+    except socket.timeout:
+        return None, "Connection timeout", tcp_infos
+    except ConnectionRefusedError:
+        return None, "Connection refused", tcp_infos
+    except Exception as e:
+        return None, f"Error: {str(e)}", tcp_infos
+    finally:
+        if sock:
+            sock.close()
+
+def icmp_ping(ip, timeout=5):
     # ICMP ping logic
     try:
+        ipv6 = address_family(ip) == socket.AF_INET6
+
         # Construct the ICMP Echo Request packet
-        icmp_type = 8  # ICMP Echo Request type
+        icmp_type = 128 if ipv6 else 8  # ICMPv6/ICMP Echo Request type
         icmp_code = 0  # ICMP Echo Request code
         icmp_checksum = 0  # ICMP Checksum initially set to 0
         icmp_id = os.getpid() & 0xFFFF  # Generate ICMP identifier (PID)
         icmp_seq = 1  # ICMP sequence number
 
         # Create the ICMP header
-        icmp_header = struct.pack("bbHHh", icmp_type, icmp_code, icmp_checksum, icmp_id, icmp_seq)
+        icmp_header = struct.pack("BbHHh", icmp_type, icmp_code, icmp_checksum, icmp_id, icmp_seq)
 
-        # Calculate ICMP checksum
-        icmp_checksum = calculate_checksum(icmp_header)
+        # Calculate ICMP checksum (the kernel fills in the ICMPv6 checksum since it covers the IPv6 pseudo-header)
+        if not ipv6:
+            icmp_checksum = calculate_checksum(icmp_header)
 
         # Pack the ICMP header with the updated checksum
-        icmp_header = struct.pack("bbHHh", icmp_type, icmp_code, socket.htons(icmp_checksum), icmp_id, icmp_seq)
+        icmp_header = struct.pack("BbHHh", icmp_type, icmp_code, socket.htons(icmp_checksum), icmp_id, icmp_seq)
 
         # Create the ICMP packet
         icmp_packet = icmp_header
 
         # Create a raw socket
-        sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
-        sock.settimeout(5)  # Set the timeout to 5 seconds
+        if ipv6:
+            sock = socket.socket(socket.AF_INET6, socket.SOCK_RAW, socket.IPPROTO_ICMPV6)
+        else:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+        sock.settimeout(timeout)  # Set the timeout (5 seconds by default)
 
         start_time = time.time()  # Record the start time
         sock.sendto(icmp_packet, (ip, 0))  # Send the ICMP packet
         try:
-            data, addr = sock.recvfrom(1024)  # Receive the response
+            # Raw sockets see every ICMP packet on the host, so wait for the echo reply from this address
+            while True:
+                data, addr = sock.recvfrom(1024)  # Receive the response
+                if is_echo_reply(data, icmp_packet, ipv6) and addr[0] == ip:
+                    break
+                sock.settimeout(max(timeout - (time.time() - start_time), 0.001))
             end_time = time.time()  # Record the end time
             ms_response = (end_time - start_time) * 1000  # Calculate the time difference in milliseconds
             return ms_response, None  # Return the response time and no error
         except socket.timeout:
             return None, "Connection timeout"
+        finally:
+            sock.close()
 
     except socket.timeout:
         return None, "Connection timeout"
@@ -172,6 +660,137 @@ def icmp_ping(ip):
         error_message = f"An error occurred: {str(e)}"
         return None, error_message
 
+def is_echo_reply(data, request, ipv6):
+    # IPv4 raw sockets hand us the IP header as well, IPv6 raw sockets only the ICMPv6 message
+    offset = 0 if ipv6 else (data[0] & 0x0F) * 4
+    reply = data[offset:offset + 8]
+    if len(reply) < 8:
+        return False
+    # Echo Reply type, matching identifier and sequence number
+    return reply[0] == (129 if ipv6 else 0) and reply[4:8] == request[4:8]
+
+class BurstReport:
+    def __init__(self, sent, rtts, lost, reordered, duplicates, late, longest_loss, elapsed, send_failures, send_times, seq_rtts):
+        self.sent = sent
+        self.rtts = rtts  # Response times in milliseconds of every first (non-duplicate) reply, late ones included
+        self.send_times = send_times  # Send time of every sequence number
+        self.seq_rtts = seq_rtts  # Response time of every sequence number, NaN for the ones without a reply
+        self.lost = lost  # Sequence numbers that were sent but never got a reply
+        self.reordered = reordered  # Replies that arrived after a reply to a later sequence number
+        self.duplicates = duplicates  # Extra replies to a sequence number that was already answered
+        self.late = late  # Replies that arrived after the timeout; they still count as received, not lost
+        self.longest_loss = longest_loss  # Longest run of consecutive lost sequence numbers
+        self.elapsed = elapsed
+        self.send_failures = send_failures  # Sequence numbers the local send buffer refused, never on the wire
+
+def icmp_burst(ip, count, rate, window=64, timeout=1):
+    # Pipelined ICMP mode: keep up to `window` echo requests in flight, sent at `rate` packets per second
+    # with increasing sequence numbers, then report loss, reordering, duplicates and late replies
+    if not 0 < count <= 0x10000:
+        raise ValueError("Burst size must be between 1 and 65536 packets")
+
+    ipv6 = address_family(ip) == socket.AF_INET6
+    icmp_type = 128 if ipv6 else 8  # ICMPv6/ICMP Echo Request type
+    icmp_id = os.getpid() & 0xFFFF  # Generate ICMP identifier (PID)
+
+    send_times = array.array("d", bytes(8 * count))  # Send time of every sequence number
+    replies = bytearray(count)  # Number of replies seen for every sequence number (saturates at 255)
+    unsent = bytearray(count)  # 1 for sequence numbers whose send failed locally
+    rtts = array.array("d")
+    seq_rtts = array.array("d", [math.nan]) * count
+    outstanding = collections.deque()  # Sequence numbers in send order, to find the in-flight window cheaply
+    reordered = duplicates = late = 0
+    highest_seq = -1
+
+    if ipv6:
+        sock = socket.socket(socket.AF_INET6, socket.SOCK_RAW, socket.IPPROTO_ICMPV6)
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+    sock.setblocking(False)
+    selector = selectors.DefaultSelector()
+    selector.register(sock, selectors.EVENT_READ)
+
+    try:
+        start_time = time.time()
+        sent = 0
+        while True:
+            now = time.time()
+
+            # Retire answered or timed out requests from the front of the window
+            while outstanding and (replies[outstanding[0]] or send_times[outstanding[0]] + timeout <= now):
+                outstanding.popleft()
+
+            if sent < count:
+                if len(outstanding) < window and now >= start_time + sent / rate:
+                    header = struct.pack("BbHHH", icmp_type, 0, 0, icmp_id, sent)
+                    if not ipv6:  # The kernel fills in the ICMPv6 checksum
+                        header = struct.pack("BbHHH", icmp_type, 0, socket.htons(calculate_checksum(header)), icmp_id, sent)
+                    send_times[sent] = time.time()
+                    try:
+                        sock.sendto(header, (ip, 0))
+                        outstanding.append(sent)
+                    except OSError as e:
+                        if e.errno not in SEND_BUFFER_ERRNOS:
+                            # Unreachable networks, broadcast addresses and the like fail every packet, so stop here
+                            raise ConnectionError(e.errno, f"Sending to {ip} failed: {e.strerror}") from e
+                        # A full send buffer at high rates costs this packet, not the run
+                        unsent[sent] = 1
+                    sent += 1
+                    continue
+                wait = max(start_time + sent / rate - now, 0) if len(outstanding) < window else timeout
+            elif not outstanding:
+                # Everything is answered or timed out; give stragglers one more timeout to show up as late
+                if all(replies) or now >= send_times[count - 1] + 2 * timeout:
+                    break
+                wait = send_times[count - 1] + 2 * timeout - now
+            else:
+                wait = send_times[outstanding[0]] + timeout - now
+
+            for _ in selector.select(max(wait, 0)):
+                while True:
+                    try:
+                        data, addr = sock.recvfrom(1024)
+                    except BlockingIOError:
+                        break
+                    end_time = time.time()
+
+                    offset = 0 if ipv6 else (data[0] & 0x0F) * 4
+                    reply = data[offset:offset + 8]
+                    if len(reply) < 8 or addr[0] != ip:
+                        continue
+                    reply_type, _, _, reply_id, seq = struct.unpack("BbHHH", reply)
+                    if reply_type != (129 if ipv6 else 0) or reply_id != icmp_id or seq >= sent:
+                        continue
+
+                    if replies[seq]:
+                        duplicates += 1
+                        replies[seq] = min(replies[seq] + 1, 255)
+                        continue
+                    replies[seq] = 1
+
+                    rtt = (end_time - send_times[seq]) * 1000
+                    rtts.append(rtt)
+                    seq_rtts[seq] = rtt
+                    if rtt > timeout * 1000:
+                        late += 1
+                    if seq < highest_seq:
+                        reordered += 1
+                    highest_seq = max(highest_seq, seq)
+
+        lost = [seq for seq in range(count) if not replies[seq] and not unsent[seq]]
+        send_failures = [seq for seq in range(count) if unsent[seq]]
+        longest_loss = run = 0
+        previous = None
+        for seq in lost:
+            run = run + 1 if previous == seq - 1 else 1
+            longest_loss = max(longest_loss, run)
+            previous = seq
+
+        return BurstReport(count, rtts, lost, reordered, duplicates, late, longest_loss, time.time() - start_time, send_failures, send_times, seq_rtts)
+    finally:
+        selector.close()
+        sock.close()
+
 def calculate_checksum(data):
     # Calculate the checksum for ICMP packets.
     checksum = 0
@@ -194,26 +813,226 @@ def calculate_checksum(data):
 
     return checksum
 
-def http_ping(url):
-    # HTTP ping logic
+def http_ping_address(ip, url, timeout=10):
+    # HTTP ping logic pinned to one resolved address, keeping the URL's host for the Host header and TLS SNI
     try:
+        parsed = urllib.parse.urlsplit(url)
+        https = parsed.scheme == "https"
+        port = parsed.port or (443 if https else 80)
+        path = parsed.path or "/"
+        if parsed.query:
+            path += "?" + parsed.query
+
         start_time = time.time()  # Record the start time
-        response = urllib.request.urlopen(url, timeout=10)  # Increase the timeout to 10 seconds
-        end_time = time.time()  # Record the end time
-        
+        sock = socket.create_connection((ip, port), timeout=timeout)
+        if https:
+            sock = ssl.create_default_context().wrap_socket(sock, server_hostname=parsed.hostname)
+            connection = http.client.HTTPSConnection(parsed.hostname, port, timeout=timeout)
+        else:
+            connection = http.client.HTTPConnection(parsed.hostname, port, timeout=timeout)
+        connection.sock = sock
+        try:
+            connection.request("GET", path, headers={"Host": parsed.netloc})
+            response = connection.getresponse()
+            end_time = time.time()  # Record the end time
+        finally:
+            connection.close()
+
+        if response.status >= 400:
+            return None, f"HTTP Error {response.status}: {response.reason}"
+
         ms_response = (end_time - start_time) * 1000  # Calculate the time difference in milliseconds
         return ms_response, None  # Return the response time and no error
-    
-    except urllib.error.URLError as e:
-        return None, str(e)  # Return the error message without the "Error: " prefix
+
     except socket.timeout:
         return None, "Connection timeout"
+    except ConnectionRefusedError:
+        return None, "Connection refused"
     except Exception as e:
         return None, f"Error: {str(e)}"
 
+def resolve_target(target, protocol, port=None):
+    # Resolve the addresses probe_target would probe for the target
+    if protocol == "HTTP":
+        return resolve_addresses(urllib.parse.urlsplit(target).hostname)
+    if protocol == "UDP":
+        return resolve_addresses(target, port, socket.SOCK_DGRAM)
+    if protocol == "ICMP":
+        return resolve_addresses(target, socktype=socket.SOCK_RAW)
+    return resolve_addresses(target, port)
+
+def probe_method(target, protocol, port=None, timeout=None):
+    # The single-address probe for a UDP, ICMP or HTTP target and the arguments that follow the address
+    timeout_args = (timeout,) if timeout is not None else ()
+    if protocol == "HTTP":
+        return http_ping_address, (target,) + timeout_args
+    if protocol == "UDP":
+        return udp_ping, (port,) + timeout_args
+    if protocol == "ICMP":
+        return icmp_ping, timeout_args
+    raise ValueError(f"Unknown protocol {protocol}")
+
+def probe_target(target, protocol, port=None, timeout=None, addresses=None):
+    # Probe every address of the target once with the given protocol and return a PingResult per address.
+    # Callers that probe the same target repeatedly can pass already resolved addresses.
+    if protocol not in ("TCP", "UDP", "ICMP", "HTTP"):
+        raise ValueError(f"Unknown protocol {protocol}")
+    addresses = addresses or resolve_target(target, protocol, port)
+    if protocol == "TCP":
+        probes = [probe[:3] for probe in tcp_race(addresses, port, timeout if timeout is not None else 5)]
+    else:
+        ping_method, args = probe_method(target, protocol, port, timeout)
+        probes = probe_addresses(ping_method, addresses, *args)
+    return [PingResult(target, protocol, port, response_time, error, ip) for ip, response_time, error in probes]
+
+JOURNAL_FILE = "pingit.journal"
+
+# Journal records are a type byte and a payload length followed by the payload:
+#   S  sweep settings as JSON, written once when the sweep starts
+#   R  one probe result: round, target index, timestamp, response time (NaN on failure), address, error
+#   D  round, target index: every result for that target in that round has been written
+#   E  the sweep finished
+JOURNAL_RECORD = struct.Struct("!cI")
+JOURNAL_RESULT = struct.Struct("!IIdd")
+JOURNAL_DONE = struct.Struct("!II")
+
+class SweepJournal:
+    def __init__(self, path=JOURNAL_FILE, checkpoint_interval=5):
+        self.path = path
+        self.checkpoint_interval = checkpoint_interval  # Seconds between forced writes to disk
+        self.file = None
+        self.last_checkpoint = 0
+
+    def load(self):
+        # Return (settings, {(round, target index): [PingResult, ...]}, good offset) for an unfinished
+        # sweep, or None. The good offset is where the last intact record ends; anything after it is a
+        # torn or corrupt tail that resume() cuts off before appending.
+        if not os.path.exists(self.path):
+            return None
+        settings = None
+        pending = {}  # Results of units whose D record hasn't been seen (yet)
+        completed = {}
+        with open(self.path, "rb") as file:
+            data = file.read()
+        offset = 0
+        while offset + JOURNAL_RECORD.size <= len(data):
+            record_type, length = JOURNAL_RECORD.unpack_from(data, offset)
+            payload = data[offset + JOURNAL_RECORD.size:offset + JOURNAL_RECORD.size + length]
+            if len(payload) < length:
+                break  # The run died halfway through writing this record
+
+            try:
+                if record_type == b"S":
+                    settings = json.loads(payload)
+                elif record_type == b"R":
+                    round_number, target_index, timestamp, response_time = JOURNAL_RESULT.unpack_from(payload)
+                    address, error = payload[JOURNAL_RESULT.size:].decode().split("\0")
+                    result = PingResult(settings["targets"][target_index], settings["protocol"], settings["port"],
+                                        None if math.isnan(response_time) else response_time, error or None, address or None)
+                    result.timestamp = timestamp
+                    pending.setdefault((round_number, target_index), []).append(result)
+                elif record_type == b"D":
+                    unit = JOURNAL_DONE.unpack(payload)
+                    completed[unit] = pending.pop(unit, [])
+                elif record_type == b"E":
+                    return None
+                else:
+                    break  # Not a record type we write, so the rest of the file is garbage
+            except (struct.error, UnicodeDecodeError, ValueError, KeyError, IndexError, TypeError):
+                break  # Corrupt record: keep everything before it
+            offset += JOURNAL_RECORD.size + length
+        return (settings, completed, offset) if settings else None
+
+    def start(self, settings):
+        settings.setdefault("id", time.time())  # Tells this sweep's units apart from any other sweep's
+        self.file = open(self.path, "wb")
+        self.write(b"S", json.dumps(settings).encode())
+        self.checkpoint(force=True)
+
+    def resume(self, offset):
+        # Drop any torn tail so new records follow the last intact one
+        self.file = open(self.path, "r+b")
+        self.file.truncate(offset)
+        self.file.seek(offset)
+
+    def record(self, round_number, target_index, results):
+        for result in results:
+            response_time = result.response_time if result.response_time is not None else math.nan
+            strings = f"{result.address or ''}\0{result.error or ''}".encode()
+            self.write(b"R", JOURNAL_RESULT.pack(round_number, target_index, result.timestamp, response_time) + strings)
+        self.write(b"D", JOURNAL_DONE.pack(round_number, target_index))
+        self.checkpoint()
+
+    def finish(self):
+        self.write(b"E", b"")
+        self.close()
+        os.remove(self.path)
+
+    def write(self, record_type, payload):
+        self.file.write(JOURNAL_RECORD.pack(record_type, len(payload)) + payload)
+
+    def checkpoint(self, force=False):
+        # Records are buffered and only pushed to disk every checkpoint_interval seconds; a crash loses
+        # at most that much work, and units without their D record are simply probed again on resume
+        if force or time.time() - self.last_checkpoint >= self.checkpoint_interval:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.last_checkpoint = time.time()
+
+    def close(self):
+        if self.file:
+            self.checkpoint(force=True)
+            self.file.close()
+            self.file = None
+
+def run_sweep(history, journal, settings, completed=None):
+    # Probe every target for every round, skipping units a resumed journal already has. Journaled
+    # results are only replayed into the history if this session doesn't hold them already.
+    completed = completed or {}
+    targets = settings["targets"]
+    for (round_number, target_index), results in completed.items():
+        unit = (settings["id"], round_number, target_index)
+        if unit in history.journal_units:
+            continue
+        history.journal_units.add(unit)
+        for result in results:
+            history.add_result(result, save=False, log=False)
+
+    try:
+        probed = False  # Whether this run has probed anything yet, so resumed rounds don't wait out old delays
+        for round_number in range(settings["count"]):
+            remaining = [target_index for target_index in range(len(targets)) if (round_number, target_index) not in completed]
+            if not remaining:
+                continue
+            if probed:
+                time.sleep(settings["delay"])  # Add a delay between each round
+            probed = True
+
+            for target_index in remaining:
+                target = targets[target_index]
+                try:
+                    results = probe_target(target, settings["protocol"], settings["port"])
+                except (socket.gaierror, ValueError) as e:
+                    results = [PingResult(target, settings["protocol"], settings["port"], None, f"Error: {str(e)}")]
+                for result in results:
+                    history.add_result(result, save=False)
+                journal.record(round_number, target_index, results)
+                history.journal_units.add((settings["id"], round_number, target_index))
+
+                failed = len([result for result in results if result.response_time is None])
+                status = f"{CGREEN}{len(results) - failed}/{len(results)} connected{CRESET}" if not failed else f"{CRED}{failed}/{len(results)} failed{CRESET}"
+                print(f"Round {round_number + 1}/{settings['count']} | Target {target_index + 1}/{len(targets)} {CGREEN}{target}{CRESET} | {status}")
+    except KeyboardInterrupt:
+        journal.close()
+        print(f"\n{CRED}Sweep interrupted. Progress was saved to {journal.path}, choose Sweep again to resume.{CRESET}")
+        return False
+
+    journal.finish()
+    return True
+
 def main_menu():
     main_menu_title = "  Select an option.\n  Press Q or Esc to quit. \n"
-    main_menu_items = ["-- METHODS --", "TCP Ping", "UDP Ping", "ICMP Ping", "HTTP Ping", "-- OTHER --", "View History", "View Statistics", "Quit"]
+    main_menu_items = ["-- METHODS --", "TCP Ping", "UDP Ping", "ICMP Ping", "HTTP Ping", "High-Rate TCP", "ICMP Burst", "Sweep (Target List)", "-- OTHER --", "View History", "View Statistics", "Export Archive", "Quit"]
     main_menu_cursor = "> "
     main_menu_cursor_style = ("fg_red", "bold")
     main_menu_style = ("bg_red", "fg_black")
@@ -233,7 +1052,9 @@ def main_menu():
     print(welcome_message)
     print(info)
 
-    history = PingHistory()  # Create a new instance of PingHistory
+    event_log = EventLog(classify=error_class)
+    atexit.register(event_log.close)  # Drain the queue however the menu exits
+    history = PingHistory(event_log)  # Create a new instance of PingHistory
 
     while not main_menu_exit:
         main_sel = main_menu.show()
@@ -254,24 +1075,35 @@ def main_menu():
                 delay = input("Enter a delay (in seconds): ")
             if int(delay) <= 0:
                 print(f"{CRED}Invalid delay value. Delay must be greater than 0.{CRESET}")
-                return
+                continue
+            read_info = input("Read kernel TCP_INFO RTT? (y/N): ").strip().lower() == "y"
+            samples = input("Hold each connection and sample TCP_INFO N times (blank for no hold): ").strip() if read_info else ""
 
             try:
-                ip = target if target.isdigit() else socket.gethostbyname(target)  # Get the IP address from the hostname or use the IP directly
-                print(f"Attempting to connect to {CGREEN}{target} {CWHITE}[{CGREEN}{ip}{CWHITE}] {CRESET}on {CGREEN}TCP {CWHITE}Port: {CGREEN}{port}{CRESET}\n")
+                addresses = resolve_addresses(target, int(port))  # Get every IPv4 and IPv6 address of the hostname or use the IP directly
+                print(f"Attempting to connect to {CGREEN}{target} {CWHITE}[{CGREEN}{', '.join(addresses)}{CWHITE}] {CRESET}on {CGREEN}TCP {CWHITE}Port: {CGREEN}{port}{CRESET}\n")
 
                 for _ in range(int(num_pings)):
-                    response_time, error = tcp_ping(ip, int(port))
-
-                    result = PingResult(target, "TCP", port, response_time, error)
-                    history.add_result(result)
-
-                    if response_time is not None:
-                        response_str = f"Connected | {CGREEN}{ip}{CRESET} {CWHITE}| Time = {CGREEN}{response_time:.0f} ms{CRESET} {CWHITE}| Protocol {CGREEN}TCP{CRESET} {CWHITE}| Port {CGREEN}{port}{CRESET}"
-                        print(response_str)
+                    if samples:
+                        race_results = probe_addresses(tcp_hold, addresses, int(port), int(samples))
                     else:
-                        error_str = f"Failed to reach {CRED}{ip}{CRESET} on {CRED}{port}{CRESET} | Error: {CRED}{error}{CRESET}"
-                        print(error_str)
+                        race_results = [(ip, response_time, error, [tcp_info] if tcp_info else []) for ip, response_time, error, tcp_info in tcp_race(addresses, int(port), read_info=read_info)]
+                    winner = race_winner(race_results)
+
+                    for ip, response_time, error, tcp_infos in race_results:
+                        result = PingResult(target, "TCP", port, response_time, error, ip, tcp_infos)
+                        history.add_result(result)
+
+                        if response_time is not None:
+                            response_str = f"Connected | {CGREEN}{ip}{CRESET} {CWHITE}| Time = {CGREEN}{response_time:.0f} ms{CRESET} {CWHITE}| Protocol {CGREEN}TCP{CRESET} {CWHITE}| Port {CGREEN}{port}{CRESET} {CWHITE}| {CGREEN}{result.family}{CRESET}"
+                            if ip == winner:
+                                response_str += f" {CWHITE}| {CGREEN}Fastest{CRESET}"
+                            print(response_str)
+                            for tcp_info in tcp_infos:
+                                print(f"    Kernel RTT = {CGREEN}{tcp_info}{CRESET}")
+                        else:
+                            error_str = f"Failed to reach {CRED}{ip}{CRESET} on {CRED}{port}{CRESET} | Error: {CRED}{error}{CRESET}"
+                            print(error_str)
 
                     time.sleep(int(delay))  # Add a delay between each ping
 
@@ -296,24 +1128,23 @@ def main_menu():
                 delay = input("Enter a delay (in seconds): ")
             if int(delay) <= 0:
                 print(f"{CRED}Invalid delay value. Delay must be greater than 0.{CRESET}")
-                return
+                continue
 
             try:
-                ip = target if target.isdigit() else socket.gethostbyname(target)  # Get the IP address from the hostname or use the IP directly
-                print(f"Attempting to connect to {CGREEN}{target} {CWHITE}[{CGREEN}{ip}{CWHITE}] {CRESET}on {CGREEN}UDP {CWHITE}Port: {CGREEN}{port}{CRESET}\n")
+                addresses = resolve_addresses(target, int(port), socket.SOCK_DGRAM)  # Get every IPv4 and IPv6 address of the hostname or use the IP directly
+                print(f"Attempting to connect to {CGREEN}{target} {CWHITE}[{CGREEN}{', '.join(addresses)}{CWHITE}] {CRESET}on {CGREEN}UDP {CWHITE}Port: {CGREEN}{port}{CRESET}\n")
 
                 for _ in range(int(num_pings)):
-                    response_time, error = udp_ping(ip, int(port))
-
-                    result = PingResult(target, "UDP", port, response_time, error)
-                    history.add_result(result)
+                    for ip, response_time, error in probe_addresses(udp_ping, addresses, int(port)):
+                        result = PingResult(target, "UDP", port, response_time, error, ip)
+                        history.add_result(result)
 
-                    if response_time is not None:
-                        response_str = f"Connected | {CGREEN}{ip}{CRESET} {CWHITE}| Time = {CGREEN}{response_time:.0f} ms{CRESET} {CWHITE}| Protocol {CGREEN}UDP{CRESET} {CWHITE}| Port {CGREEN}{port}{CRESET}"
-                        print(response_str)
-                    else:
-                        error_str = f"Failed to reach {CRED}{ip}{CRESET} on {CRED}{port}{CRESET} | Error: {CRED}{error}{CRESET}"
-                        print(error_str)
+                        if response_time is not None:
+                            response_str = f"Connected | {CGREEN}{ip}{CRESET} {CWHITE}| Time = {CGREEN}{response_time:.0f} ms{CRESET} {CWHITE}| Protocol {CGREEN}UDP{CRESET} {CWHITE}| Port {CGREEN}{port}{CRESET} {CWHITE}| {CGREEN}{result.family}{CRESET}"
+                            print(response_str)
+                        else:
+                            error_str = f"Failed to reach {CRED}{ip}{CRESET} on {CRED}{port}{CRESET} | Error: {CRED}{error}{CRESET}"
+                            print(error_str)
 
                     time.sleep(int(delay))  # Add a delay between each ping
 
@@ -335,24 +1166,23 @@ def main_menu():
                 delay = input("Enter a delay (in seconds): ")
             if int(delay) <= 0:
                 print(f"{CRED}Invalid delay value. Delay must be greater than 0.{CRESET}")
-                return
+                continue
 
             try:
-                ip = target if target.isdigit() else socket.gethostbyname(target)  # Get the IP address from the hostname or use the IP directly
-                print(f"Attempting to connect to {CGREEN}{target} {CWHITE}[{CGREEN}{ip}{CWHITE}] {CRESET}using {CGREEN}ICMP{CRESET}\n")
+                addresses = resolve_addresses(target, socktype=socket.SOCK_RAW)  # Get every IPv4 and IPv6 address of the hostname or use the IP directly
+                print(f"Attempting to connect to {CGREEN}{target} {CWHITE}[{CGREEN}{', '.join(addresses)}{CWHITE}] {CRESET}using {CGREEN}ICMP{CRESET}\n")
 
                 for _ in range(int(num_pings)):
-                    response_time, error = icmp_ping(ip)
+                    for ip, response_time, error in probe_addresses(icmp_ping, addresses):
+                        result = PingResult(target, "ICMP", None, response_time, error, ip)
+                        history.add_result(result)
 
-                    result = PingResult(target, "ICMP", None, response_time, error)
-                    history.add_result(result)
-
-                    if response_time is not None:
-                        response_str = f"Connected | {CGREEN}{ip}{CRESET} {CWHITE}| Time = {CGREEN}{response_time:.0f} ms{CRESET} {CWHITE}| Protocol {CGREEN}ICMP{CRESET}"
-                        print(response_str)
-                    else:
-                        error_str = f"Failed to reach {CRED}{ip}{CRESET} | Error: {CRED}{error}{CRESET}"
-                        print(error_str)
+                        if response_time is not None:
+                            response_str = f"Connected | {CGREEN}{ip}{CRESET} {CWHITE}| Time = {CGREEN}{response_time:.0f} ms{CRESET} {CWHITE}| Protocol {CGREEN}ICMP{CRESET} {CWHITE}| {CGREEN}{result.family}{CRESET}"
+                            print(response_str)
+                        else:
+                            error_str = f"Failed to reach {CRED}{ip}{CRESET} | Error: {CRED}{error}{CRESET}"
+                            print(error_str)
 
                     time.sleep(int(delay))  # Add a delay between each ping
 
@@ -374,36 +1204,201 @@ def main_menu():
                 delay = input("Enter a delay (in seconds): ")
             if int(delay) <= 0:
                 print(f"{CRED}Invalid delay value. Delay must be greater than 0.{CRESET}")
-                return
+                continue
 
             try:
-                print(f"Attempting to connect to {CGREEN}{url}{CRESET} using {CGREEN}HTTP{CRESET}\n")
+                addresses = resolve_addresses(urllib.parse.urlsplit(url).hostname)  # Get every IPv4 and IPv6 address of the URL's host
+                print(f"Attempting to connect to {CGREEN}{url} {CWHITE}[{CGREEN}{', '.join(addresses)}{CWHITE}] {CRESET}using {CGREEN}HTTP{CRESET}\n")
 
                 for _ in range(int(num_pings)):
-                    response_time, error = http_ping(url)
+                    for ip, response_time, error in probe_addresses(http_ping_address, addresses, url):
+                        result = PingResult(url, "HTTP", None, response_time, error, ip)
+                        history.add_result(result)
 
-                    result = PingResult(url, "HTTP", None, response_time, error)
-                    history.add_result(result)
-
-                    if response_time is not None:
-                        response_str = f"Connected | {CGREEN}{url}{CRESET} {CWHITE}| Time = {CGREEN}{response_time:.0f} ms{CRESET} {CWHITE}| Protocol {CGREEN}HTTP{CRESET}"
-                        print(response_str)
-                    else:
-                        error_str = f"Failed to reach {CRED}{url}{CRESET} | Error: {CRED}{error}{CRESET}"
-                        print(error_str)
+                        if response_time is not None:
+                            response_str = f"Connected | {CGREEN}{url}{CRESET} {CWHITE}[{CGREEN}{ip}{CWHITE}] | Time = {CGREEN}{response_time:.0f} ms{CRESET} {CWHITE}| Protocol {CGREEN}HTTP{CRESET} {CWHITE}| {CGREEN}{result.family}{CRESET}"
+                            print(response_str)
+                        else:
+                            error_str = f"Failed to reach {CRED}{url}{CRESET} [{CRED}{ip}{CRESET}] | Error: {CRED}{error}{CRESET}"
+                            print(error_str)
 
                     time.sleep(int(delay))  # Add a delay between each ping
 
+            except (socket.gaierror, ValueError) as e:
+                print(f"{CRED}Invalid URL | Error: {str(e)}")
             except Exception as e:
                 print(f"{CRED}An error occurred | Error: {str(e)}")
 
         elif main_sel == 5:
-            history.display_history()
+            print(f"{CRED}High-Rate TCP selected{CRESET}")
+            target = ""
+            while not target:
+                target = input("Enter an IP address or website: ")
+            port = ""
+            while not port:
+                port = input("Enter a port: ")
+            num_pings = ""
+            while not num_pings:
+                num_pings = input("Enter the number of connects: ")
+            rate = ""
+            while not rate:
+                rate = input("Enter the rate (connects per second): ")
+            linger_reset = input("Close with RST to avoid TIME_WAIT? (y/N): ").strip().lower() == "y"
+            port_range = input("Enter a source port range, e.g. 40000-49999 (blank for OS ephemeral ports): ").strip()
+
+            try:
+                port_allocator = None
+                if port_range:
+                    low, high = (int(value) for value in port_range.split("-"))
+                    port_allocator = SourcePortAllocator(low, high)
+
+                addresses = resolve_addresses(target, int(port))  # Get every IPv4 and IPv6 address of the hostname or use the IP directly
+                print(f"Flooding {CGREEN}{target} {CWHITE}[{CGREEN}{', '.join(addresses)}{CWHITE}] {CRESET}on {CGREEN}TCP {CWHITE}Port: {CGREEN}{port} {CWHITE}at {CGREEN}{rate}/s{CRESET}\n")
+
+                start_time = time.time()
+                flood_results = tcp_flood(addresses, int(port), int(num_pings), float(rate), linger_reset, port_allocator)
+                elapsed = time.time() - start_time
+
+                for ip, response_time, error, sent_time in flood_results:
+                    result = PingResult(target, "TCP", port, response_time, error, ip)
+                    result.timestamp = sent_time  # When this connect was started, not when the whole run finished
+                    history.add_result(result, save=False)
+
+                response_times = [response_time for _, response_time, _, _ in flood_results if response_time is not None]
+                local_failures = len([error for _, _, error, _ in flood_results if is_local_error(error)])
+                remote_failures = len(flood_results) - len(response_times) - local_failures
+                average_response_time = sum(response_times) / len(response_times) if response_times else 0
+
+                start_span = flood_results[-1][3] - flood_results[0][3]
+                achieved_rate = (len(flood_results) - 1) / start_span if start_span > 0 else float(rate)
+                print(f"{CWHITE}Connects: {CGREEN}{len(flood_results)} {CWHITE}in {CGREEN}{elapsed:.2f} s {CWHITE}({CGREEN}{len(flood_results) / elapsed:.0f}/s{CWHITE}){CRESET}")
+                print(f"{CWHITE}Requested Rate: {CGREEN}{float(rate):.0f}/s {CWHITE}| Achieved Rate: {CGREEN if achieved_rate >= float(rate) * 0.95 else CRED}{achieved_rate:.0f}/s{CRESET}")
+                print(f"{CWHITE}Connected: {CGREEN}{len(response_times)} {CWHITE}| Average Time = {CGREEN}{average_response_time:.2f} ms{CRESET}")
+                print(f"{CWHITE}Remote Failures: {CRED}{remote_failures}{CRESET}")
+                print(f"{CWHITE}Local Resource Failures: {CRED}{local_failures}{CRESET}")
+                if port_allocator:
+                    print(f"{CWHITE}Source Port Pressure: {CGREEN}{port_allocator.pressure() * 100:.1f}% {CWHITE}| Exhausted: {CGREEN}{port_allocator.exhausted}{CRESET}")
+                system_pressure = local_port_pressure()
+                if system_pressure is not None:
+                    print(f"{CWHITE}Ephemeral Port Pressure: {CGREEN}{system_pressure * 100:.1f}%{CRESET}")
+
+            except (socket.gaierror, ValueError) as e:
+                print(f"{CRED}Invalid input | Error: {str(e)}")
+            except Exception as e:
+                print(f"{CRED}An error occurred | Error: {str(e)}")
 
         elif main_sel == 6:
-            history.display_statistics()
+            print(f"{CRED}ICMP Burst selected{CRESET}")
+            target = ""
+            while not target:
+                target = input("Enter an IP address or website: ")
+            num_pings = ""
+            while not num_pings:
+                num_pings = input("Enter the number of packets: ")
+            rate = ""
+            while not rate:
+                rate = input("Enter the rate (packets per second): ")
+            window = input("Enter the number of packets in flight (blank for 64): ").strip() or "64"
+
+            try:
+                ip = resolve_addresses(target, socktype=socket.SOCK_RAW)[0]  # Bursts go to one address so the sequence numbers stay comparable
+                print(f"Bursting {CGREEN}{target} {CWHITE}[{CGREEN}{ip}{CWHITE}] {CRESET}using {CGREEN}ICMP {CWHITE}at {CGREEN}{rate}/s{CRESET}\n")
+
+                report = icmp_burst(ip, int(num_pings), float(rate), int(window))
+
+                lost = set(report.lost)
+                send_failures = set(report.send_failures)
+                # One result per sequence number, in send order and stamped with its send time
+                for seq in range(report.sent):
+                    if seq in send_failures:
+                        result = PingResult(target, "ICMP", None, None, f"{LOCAL_ERROR_PREFIX}: send buffer full", ip)
+                    elif seq in lost:
+                        result = PingResult(target, "ICMP", None, None, "Packet lost", ip)
+                    else:
+                        result = PingResult(target, "ICMP", None, report.seq_rtts[seq], None, ip)
+                    result.timestamp = report.send_times[seq]
+                    history.add_result(result, save=False)
+
+                received = len(report.rtts)
+                print(f"{CWHITE}Sent: {CGREEN}{report.sent} {CWHITE}in {CGREEN}{report.elapsed:.2f} s {CWHITE}| Received: {CGREEN}{received}{CRESET}")
+                on_wire = report.sent - len(report.send_failures)
+                print(f"{CWHITE}Lost: {CRED}{len(lost)} {CWHITE}({CRED}{len(lost) / on_wire * 100 if on_wire else 0:.2f}%{CWHITE}) | Longest Loss Burst: {CRED}{report.longest_loss}{CRESET}")
+                print(f"{CWHITE}Reordered: {CGREEN}{report.reordered} {CWHITE}| Duplicates: {CGREEN}{report.duplicates} {CWHITE}| Late: {CGREEN}{report.late}{CRESET}")
+                if report.send_failures:
+                    print(f"{CWHITE}Local Send Failures: {CRED}{len(report.send_failures)}{CRESET}")
+                if report.rtts:
+                    print(f"{CWHITE}Time: min {CGREEN}{min(report.rtts):.2f} ms {CWHITE}| avg {CGREEN}{sum(report.rtts) / received:.2f} ms {CWHITE}| max {CGREEN}{max(report.rtts):.2f} ms{CRESET}")
+
+            except (socket.gaierror, ValueError, IndexError) as e:
+                print(f"{CRED}Invalid input | Error: {str(e)}")
+            except PermissionError:
+                print(f"{CRED}Permission denied. Please run the script as a privileged user.{CRESET}")
+            except Exception as e:
+                print(f"{CRED}An error occurred | Error: {str(e)}")
 
         elif main_sel == 7:
+            print(f"{CRED}Sweep selected{CRESET}")
+            journal = SweepJournal()
+            try:
+                saved = journal.load()
+                if saved and input(f"Resume the interrupted sweep of {len(saved[0]['targets'])} targets? (Y/n): ").strip().lower() != "n":
+                    settings, completed, offset = saved
+                    print(f"Resuming {CGREEN}{settings['protocol']}{CRESET} sweep with {CGREEN}{len(completed)}{CRESET} of {CGREEN}{len(settings['targets']) * settings['count']}{CRESET} probes already done\n")
+                    journal.resume(offset)
+                    run_sweep(history, journal, settings, completed)
+                    continue
+
+                target_file = ""
+                while not target_file:
+                    target_file = input("Enter a file with one target per line: ")
+                protocol = ""
+                while protocol not in ("TCP", "UDP", "ICMP", "HTTP"):
+                    protocol = input("Enter a protocol (TCP, UDP, ICMP or HTTP): ").strip().upper()
+                port = ""
+                while protocol in ("TCP", "UDP") and not port:
+                    port = input("Enter a port: ")
+                num_pings = ""
+                while not num_pings:
+                    num_pings = input("Enter the number of pings per target: ")
+                delay = ""
+                while not delay:
+                    delay = input("Enter a delay between rounds (in seconds): ")
+
+                with open(target_file) as file:
+                    targets = [line.strip() for line in file if line.strip() and not line.startswith("#")]
+                settings = {"targets": targets, "protocol": protocol, "port": int(port) if port else None, "count": int(num_pings), "delay": float(delay)}
+                print(f"Sweeping {CGREEN}{len(targets)}{CRESET} targets using {CGREEN}{protocol}{CRESET}\n")
+                journal.start(settings)
+                run_sweep(history, journal, settings)
+
+            except (OSError, ValueError) as e:
+                journal.close()
+                print(f"{CRED}Invalid input | Error: {str(e)}")
+            except Exception as e:
+                journal.close()
+                print(f"{CRED}An error occurred | Error: {str(e)}")
+
+        elif main_sel == 9:
+            history.display_history()
+
+        elif main_sel == 10:
+            history.display_statistics()
+
+        elif main_sel == 11:
+            if not history.results:
+                print(f"{CRED}No ping history available.{CRESET}")
+                continue
+            path = input("Enter an archive file name (blank for pingit.archive): ").strip() or "pingit.archive"
+            try:
+                appending = os.path.exists(path)
+                archived = history.export_archive(path)
+                print(f"{'Appended' if appending else 'Archived'} {CGREEN}{archived}{CRESET} results to {CGREEN}{path}{CRESET} ({CGREEN}{os.path.getsize(path)} bytes{CRESET})")
+            except OSError as e:
+                print(f"{CRED}Could not write the archive | Error: {str(e)}")
+            except ValueError as e:
+                print(f"{CRED}Not appending to {path} | Error: {str(e)}")
+
+        elif main_sel == 12:
             main_menu_exit = True
             print(f"\n{CRED}Exiting PingIt!{CRESET}")
             print(f"{CCYAN}Thank you for using PingIt!{CRESET}")
@@ -0,0 +1,293 @@
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from get import CRED, CWHITE, CRESET, CGREEN, PingResult, probe_method, resolve_target, tcp_connect_all, error_class
+from eventlog import EventLog
+
+# Successive checks are phased by multiples of the golden ratio (mod 1), which spreads any number
+# of checks evenly over their interval without knowing up front how many there will be
+GOLDEN_RATIO = 0.6180339887498949
+
+class TimerWheel:
+    # Hierarchical timing wheel: `levels` wheels of 2**slot_bits slots each, level N covering
+    # 2**(slot_bits * (N + 1)) ticks. Timers far in the future sit in a coarse slot and cascade down
+    # a level each time the wheel below wraps around, so insert, cancel and expire are all O(1).
+    # Timers are any object with `expires` (a tick) and `bucket` attributes.
+    def __init__(self, slot_bits=8, levels=4):
+        self.slot_bits = slot_bits
+        self.mask = (1 << slot_bits) - 1
+        self.wheels = [[set() for _ in range(1 << slot_bits)] for _ in range(levels)]
+        self.max_delta = (1 << (slot_bits * levels)) - 1
+        self.current = 0  # The next tick to expire
+        self.count = 0
+
+    def insert(self, timer):
+        expires = max(timer.expires, self.current)  # Overdue timers expire on the next tick
+        delta = min(expires - self.current, self.max_delta)  # Timers beyond the top wheel wait in its last slot and cascade down later
+        expires = self.current + delta
+        level = 0
+        while delta >> (self.slot_bits * (level + 1)):
+            level += 1
+        bucket = self.wheels[level][(expires >> (self.slot_bits * level)) & self.mask]
+        bucket.add(timer)
+        timer.bucket = bucket
+        self.count += 1
+
+    def cancel(self, timer):
+        if timer.bucket is not None:
+            timer.bucket.discard(timer)
+            timer.bucket = None
+            self.count -= 1
+
+    def tick(self):
+        # Expire the current tick, returning its timers, and move on to the next one
+        for level in range(len(self.wheels) - 1, 0, -1):
+            if self.current & ((1 << (self.slot_bits * level)) - 1) == 0:
+                index = (self.current >> (self.slot_bits * level)) & self.mask
+                bucket = self.wheels[level][index]
+                self.wheels[level][index] = set()
+                for timer in bucket:
+                    self.count -= 1
+                    self.insert(timer)
+
+        index = self.current & self.mask
+        due = self.wheels[0][index]
+        self.wheels[0][index] = set()
+        self.count -= len(due)
+        for timer in due:
+            timer.bucket = None
+        self.current += 1
+        return due
+
+class Check:
+    def __init__(self, target, protocol, port=None, interval=1.0, timeout=5.0):
+        self.target = target
+        self.protocol = protocol
+        self.port = port
+        self.interval = interval  # Seconds between probes
+        self.timeout = timeout
+        self.expires = 0  # Tick of the next probe
+        self.bucket = None  # Timer wheel slot the check currently sits in
+        self.interval_ticks = 1
+        self.running = False
+        self.addresses = None
+        self.resolved_at = 0
+        self.probes = 0
+        self.failures = 0
+        self.skipped = 0  # Probes not sent because the previous one was still running
+        self.last_response_time = None
+
+class Scheduler:
+    def __init__(self, tick=0.01, workers=256, engine=None, on_result=None, resolve_ttl=300):
+        self.tick = tick  # Seconds per wheel tick
+        self.wheel = TimerWheel()
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.engine = engine or self.probe_batch  # Called with (protocol, checks) for every batch of due probes
+        self.on_result = on_result
+        self.resolve_ttl = resolve_ttl  # Seconds before a check's addresses are resolved again
+        self.added = 0
+        self.late_ticks = 0  # Ticks that were processed behind schedule
+        self.running = False
+        self.lock = threading.Lock()
+
+    def add(self, check):
+        with self.lock:
+            check.interval_ticks = max(1, round(check.interval / self.tick))
+            phase = int((self.added * GOLDEN_RATIO) % 1 * check.interval_ticks)
+            check.expires = self.wheel.current + phase
+            self.wheel.insert(check)
+            self.added += 1
+        return check
+
+    def cancel(self, check):
+        with self.lock:
+            self.wheel.cancel(check)
+
+    def advance(self, to_tick):
+        # Expire every tick up to and including to_tick and hand the due checks to the engine, one batch per protocol
+        batches = {}
+        with self.lock:
+            while self.wheel.current <= to_tick:
+                for check in self.wheel.tick():
+                    batches.setdefault(check.protocol, []).append(check)
+                    # Fixed rate: keep the check's phase even if this tick ran late
+                    check.expires += check.interval_ticks
+                    if check.expires < self.wheel.current:
+                        check.expires += ((self.wheel.current - check.expires) // check.interval_ticks + 1) * check.interval_ticks
+                    self.wheel.insert(check)
+                if self.wheel.current <= to_tick:
+                    self.late_ticks += 1
+        for protocol, checks in batches.items():
+            self.engine(protocol, checks)
+
+    def probe_batch(self, protocol, checks):
+        due = []
+        for check in checks:
+            if check.running:
+                check.skipped += 1
+                continue
+            check.running = True
+            due.append(check)
+        if due:
+            self.executor.submit(self.run_batch, protocol, due)
+
+    def run_batch(self, protocol, checks):
+        settled = set()  # Checks that were finished, or handed to collect() to be finished
+
+        def settle(check, results):
+            settled.add(check)
+            self.finish(check, results)
+
+        try:
+            resolved = []
+            for check in checks:
+                try:
+                    if check.addresses is None or time.time() - check.resolved_at > self.resolve_ttl:
+                        check.addresses = resolve_target(check.target, check.protocol, check.port)
+                        check.resolved_at = time.time()
+                    resolved.append(check)
+                except Exception as e:
+                    check.addresses = None  # Resolve again next time
+                    settle(check, f"Error: {str(e)}")
+
+            if protocol == "TCP":
+                # Every connect of the batch is multiplexed on one selector instead of a thread per check
+                endpoints = [(address, check.port, check.timeout) for check in resolved for address in check.addresses]
+                probes = tcp_connect_all(endpoints)
+                offset = 0
+                for check in resolved:
+                    check_probes = probes[offset:offset + len(check.addresses)]
+                    offset += len(check.addresses)
+                    settle(check, [PingResult(check.target, protocol, check.port, response_time, error, address)
+                                   for address, (response_time, error, _) in zip(check.addresses, check_probes)])
+                return
+
+            # The other probes block, so every address gets a task on the shared pool
+            for check in resolved:
+                try:
+                    ping_method, args = probe_method(check.target, protocol, check.port, check.timeout)
+                except ValueError as e:
+                    settle(check, f"Error: {str(e)}")
+                    continue
+                futures = [self.executor.submit(ping_method, address, *args) for address in check.addresses]
+                settled.add(check)
+                self.collect(check, futures)
+        except Exception as e:
+            # The executor would swallow this, leaving the checks marked running and skipped on every later tick
+            for check in checks:
+                if check not in settled:
+                    settled.add(check)
+                    self.finish(check, f"Error: {str(e)}")
+
+    def collect(self, check, futures):
+        # Finish the check once every address has been probed, without holding a worker while it waits
+        addresses = check.addresses
+        remaining = [len(futures)]
+        lock = threading.Lock()
+
+        def done(_):
+            with lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            try:
+                results = [PingResult(check.target, check.protocol, check.port, *future.result(), address)
+                           for address, future in zip(addresses, futures)]
+            except Exception as e:
+                results = f"Error: {str(e)}"
+            self.finish(check, results)
+
+        for future in futures:
+            future.add_done_callback(done)
+
+    def finish(self, check, results):
+        # results is a list of PingResults, or an error string when the check couldn't be probed at all
+        check.running = False
+        check.probes += 1
+        response_times = [] if isinstance(results, str) else [result.response_time for result in results if result.response_time is not None]
+        if not response_times:
+            check.failures += 1
+        check.last_response_time = min(response_times) if response_times else None
+        if self.on_result:
+            self.on_result(check, results)
+
+    def run(self, duration=None):
+        self.running = True
+        start_time = time.monotonic()
+        start_tick = self.wheel.current
+        try:
+            while self.running:
+                elapsed = time.monotonic() - start_time
+                if duration is not None and elapsed >= duration:
+                    break
+                self.advance(start_tick + int(elapsed / self.tick))
+                # Sleep until the next tick boundary
+                next_tick = (int(elapsed / self.tick) + 1) * self.tick
+                time.sleep(max(next_tick - (time.monotonic() - start_time), 0))
+        finally:
+            self.running = False
+
+    def stop(self):
+        self.running = False
+
+    def close(self):
+        self.stop()
+        self.executor.shutdown(wait=True)
+
+def load_checks(path):
+    # One check per line: PROTOCOL TARGET PORT INTERVAL [TIMEOUT], with "-" as the port for ICMP and HTTP
+    checks = []
+    with open(path) as file:
+        for line in file:
+            fields = line.split()
+            if not fields or fields[0].startswith("#"):
+                continue
+            protocol, target, port, interval = fields[:4]
+            timeout = float(fields[4]) if len(fields) > 4 else 5.0
+            checks.append(Check(target, protocol.upper(), None if port == "-" else int(port), float(interval), timeout))
+    return checks
+
+def main():
+    parser = argparse.ArgumentParser(description="Run periodic PingIt! checks from a check list")
+    parser.add_argument("checks", help="File with one check per line: PROTOCOL TARGET PORT INTERVAL [TIMEOUT]")
+    parser.add_argument("--duration", type=float, help="Stop after this many seconds")
+    parser.add_argument("--tick", type=float, default=0.01, help="Scheduler resolution in seconds")
+    parser.add_argument("--workers", type=int, default=256, help="Number of threads for UDP, ICMP and HTTP probes and for batches of TCP connects")
+    parser.add_argument("--report", type=float, default=10, help="Seconds between summaries")
+    parser.add_argument("--events", default="pingit.events.jsonl", help="Structured event log file")
+    parser.add_argument("--overload", choices=["drop", "sample"], default="drop", help="What the event log does when it can't keep up")
+    args = parser.parse_args()
+
+    event_log = EventLog(args.events, classify=error_class, policy=args.overload)
+
+    def log_results(check, results):
+        if isinstance(results, str):  # The target couldn't be resolved or probed at all
+            results = [PingResult(check.target, check.protocol, check.port, None, results)]
+        for result in results:
+            event_log.log(result)
+
+    scheduler = Scheduler(args.tick, args.workers, on_result=log_results)
+    checks = [scheduler.add(check) for check in load_checks(args.checks)]
+    print(f"Scheduled {CGREEN}{len(checks)}{CRESET} checks\n")
+
+    def report():
+        while scheduler.running:
+            time.sleep(args.report)
+            probes = sum(check.probes for check in checks)
+            failures = sum(check.failures for check in checks)
+            skipped = sum(check.skipped for check in checks)
+            print(f"{CWHITE}Probes: {CGREEN}{probes} {CWHITE}| Failures: {CRED}{failures} {CWHITE}| Skipped: {CRED}{skipped} {CWHITE}| Late Ticks: {CRED}{scheduler.late_ticks}{CRESET}")
+
+    scheduler.running = True
+    threading.Thread(target=report, daemon=True).start()
+    try:
+        scheduler.run(args.duration)
+    except KeyboardInterrupt:
+        print(f"\n{CRED}Stopping checks{CRESET}")
+    finally:
+        scheduler.close()
+        event_log.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import socket
+import threading
+import pytest
+import agent
+
+@pytest.fixture
+def listener():
+    # A local TCP port that accepts every connection
+    server = socket.create_server(("127.0.0.1", 0), backlog=128)
+
+    def accept():
+        while True:
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                return
+            conn.close()
+
+    threading.Thread(target=accept, daemon=True).start()
+    yield server.getsockname()[1]
+    server.close()
+
+@pytest.fixture
+def controller():
+    controller = agent.Controller("127.0.0.1", 0)
+    yield controller
+    controller.close()
+
+def start_agent(controller, name):
+    thread = threading.Thread(target=agent.run_agent, args=("127.0.0.1", controller.port, name), daemon=True)
+    thread.start()
+    return thread
+
+def start_fake_agent(controller, name, on_job):
+    # Says hello like an agent, then lets on_job decide what happens to the first job
+    sock = socket.create_connection(("127.0.0.1", controller.port))
+    agent.send_message(sock, agent.HELLO, agent.pack_string(name))
+
+    def run():
+        try:
+            agent.recv_message(sock)
+            on_job(sock)
+        except OSError:
+            pass
+
+    threading.Thread(target=run, daemon=True).start()
+    return sock
+
+def probed_targets(vantage):
+    return sorted({result.target for result in vantage.results})
+
+def test_split_sweep_across_two_agents(controller, listener):
+    start_agent(controller, "east")
+    start_agent(controller, "west")
+    assert controller.wait_for_agents(2, timeout=5)
+
+    targets = ["127.0.0.1", "localhost", "127.0.0.2", "127.0.0.3"]
+    vantages = controller.sweep(targets, "TCP", listener, count=2, delay=0)
+
+    assert set(vantages) == {"east", "west"}
+    # Every target is probed by exactly one agent, twice
+    assert sorted(probed_targets(vantages["east"]) + probed_targets(vantages["west"])) == sorted(targets)
+    results = [result for vantage in vantages.values() for result in vantage.results]
+    assert len([result for result in results if result.target == "127.0.0.2"]) == 2
+    assert all(result.response_time is not None for result in results if result.target == "127.0.0.1")
+    assert controller.unprobed == {}
+
+def test_all_mode_probes_every_target_from_every_agent(controller, listener):
+    start_agent(controller, "east")
+    start_agent(controller, "west")
+    assert controller.wait_for_agents(2, timeout=5)
+
+    vantages = controller.sweep(["127.0.0.1", "127.0.0.2"], "TCP", listener, count=1, delay=0, mode="all")
+
+    for name in ("east", "west"):
+        assert probed_targets(vantages[name]) == ["127.0.0.1", "127.0.0.2"]
+
+def test_disconnected_agent_targets_are_reassigned(controller, listener):
+    start_agent(controller, "good")
+    start_fake_agent(controller, "flaky", lambda sock: sock.close())
+    assert controller.wait_for_agents(2, timeout=5)
+
+    targets = ["127.0.0.1", "127.0.0.2", "127.0.0.3", "127.0.0.4"]
+    vantages = controller.sweep(targets, "TCP", listener, count=1, delay=0, idle_timeout=5, timeout=30)
+
+    assert probed_targets(vantages["good"]) == targets
+    assert controller.unprobed == {}
+
+def test_hung_agent_targets_are_reported_unprobed(controller, listener):
+    hang = threading.Event()
+    sock = start_fake_agent(controller, "hung", lambda sock: hang.wait())
+    assert controller.wait_for_agents(1, timeout=5)
+
+    vantages = controller.sweep(["127.0.0.1", "127.0.0.2"], "TCP", listener, count=1, delay=0, idle_timeout=0.5)
+
+    assert vantages["hung"].results == []
+    assert controller.unprobed == {"hung": ["127.0.0.1", "127.0.0.2"]}
+    hang.set()
+    sock.close()
+
+def test_delay_longer_than_idle_timeout_keeps_agents(controller, listener):
+    start_agent(controller, "east")
+    start_agent(controller, "west")
+    assert controller.wait_for_agents(2, timeout=5)
+
+    targets = ["127.0.0.1", "localhost"]
+    vantages = controller.sweep(targets, "TCP", listener, count=2, delay=1, idle_timeout=0.8)
+
+    # Heartbeats carry both agents through the delay between rounds
+    assert sorted(controller.agents) == ["east", "west"]
+    assert controller.unprobed == {}
+    assert len(vantages["east"].results) + len(vantages["west"].results) >= 2 * len(targets)
+
+def test_job_round_trip_with_large_counts():
+    targets = [f"10.{index >> 16}.{(index >> 8) & 0xFF}.{index & 0xFF}" for index in range(70000)]
+    decoded = agent.decode_job(agent.encode_job(3, "TCP", 443, 100000, 0.5, targets))
+    assert decoded == (3, "TCP", 443, 100000, 0.5, 20.0, targets)
+
+def test_result_round_trip():
+    result = agent.PingResult("example.com", "TCP", 443, None, "Connection refused", "192.0.2.1")
+    job_id, decoded = agent.decode_result(agent.encode_result(7, result))
+    assert job_id == 7
+    assert (decoded.target, decoded.protocol, decoded.port, decoded.response_time, decoded.error, decoded.address, decoded.timestamp) == \
+        ("example.com", "TCP", 443, None, "Connection refused", "192.0.2.1", result.timestamp)
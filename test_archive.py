@@ -0,0 +1,47 @@
+import pytest
+import archive
+
+def test_block_round_trip():
+    # Irregular spacing, a step backwards in RTT, lost probes at the edges and in a run
+    samples = [(1700000000.0, None), (1700000001.0, 12.5), (1700000002.0, 9.875), (1700000002.5, None), (1700000002.75, None),
+               (1700000010.001, 250.0), (1700000011.0, 0.001), (1700000012.0, None)]
+    block = archive.encode_block("example.com TCP/443 [192.0.2.1]", samples)
+    assert list(archive.decode_block(block)) == samples
+
+def test_empty_and_single_sample_blocks():
+    assert list(archive.decode_block(archive.encode_block("a", []))) == []
+    assert list(archive.decode_block(archive.encode_block("a", [(1.5, 3.25)]))) == [(1.5, 3.25)]
+
+def test_index_round_trip(tmp_path):
+    path = tmp_path / "test.archive"
+    with archive.ArchiveWriter(path, block_size=3) as writer:
+        for second in range(7):
+            writer.add("a", 1000 + second, None if second == 4 else float(second))
+        writer.add("b", 1000.5, 1.0)
+
+    with archive.ArchiveReader(path) as reader:
+        assert reader.targets() == ["a", "b"]
+        assert [(block.target, block.start, block.end, block.count) for block in reader.index] == \
+            [("a", 1000, 1002, 3), ("a", 1003, 1005, 3), ("a", 1006, 1006, 1), ("b", 1000.5, 1000.5, 1)]
+        assert list(reader.series("a", start=1003, end=1004)) == [(1003, 3.0), (1004, None)]
+        summary = reader.summarize("a")
+        assert (summary["total"], summary["lost"], summary["min"], summary["max"]) == (7, 1, 0.0, 6.0)
+
+def test_append_keeps_earlier_blocks(tmp_path):
+    path = tmp_path / "test.archive"
+    with archive.ArchiveWriter(path) as writer:
+        writer.add("a", 1000, 1.0)
+    with archive.ArchiveWriter(path, append=True) as writer:
+        writer.add("a", 2000, 2.0)
+        writer.add("b", 2000, None)
+
+    with archive.ArchiveReader(path) as reader:
+        assert list(reader.series("a")) == [(1000, 1.0), (2000, 2.0)]
+        assert list(reader.series("b")) == [(2000, None)]
+
+def test_append_refuses_other_files(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_bytes(b"not an archive, keep me")
+    with pytest.raises(ValueError):
+        archive.ArchiveWriter(path, append=True)
+    assert path.read_bytes() == b"not an archive, keep me"